@@ -2,158 +2,105 @@
 
 from __future__ import annotations
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import joblib
-import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
 import os
+import queue
+
+import pandas as pd
 
-from nba_api.stats.endpoints import ScoreboardV2
 from nba_api.stats.static import teams as nba_teams
 
-from feature_builder import build_features_for_matchup
+from history import DEFAULT_COLUMNS, DEFAULT_LIMIT, MAX_LIMIT, decode_cursor, encode_cursor, iter_history_json
+from http_cache import compress_response, conditional, make_etag
+from live import LiveTracker, create_feed, pregame_home_probability, sse_event
+from predictor import predict_from_features, prepare_feature_array, prepare_feature_matrix
+from profiling import init_profiling
+from refresh_worker import RefreshWorker, SnapshotStore, build_snapshot
 
 app = Flask(__name__)
-CORS(app)
-
-# Paths & static resources
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "data")
+CORS(app, expose_headers=["ETag"])
+app.after_request(compress_response)
+init_profiling(app)
 
-MODEL_PATH = os.path.join(DATA_DIR, "lakers_win_model.pkl")
-SCALER_PATH = os.path.join(DATA_DIR, "lakers_scaler.pkl")
-FEATURE_COLS_PATH = os.path.join(DATA_DIR, "lakers_feature_cols.pkl")
-ROLLING_DATA_PATH = os.path.join(DATA_DIR, "all_teams_past_seasons_with_rolling.csv")
+# How long browsers may reuse a next-game prediction before revalidating
+PREDICTION_MAX_AGE = int(os.environ.get("PREDICTION_MAX_AGE", "60"))
 
-LAKERS_TEAM_ID = 1610612747
+# Seconds between background refreshes (new games, model reload, next-game scoring); 0 disables
+REFRESH_INTERVAL = float(os.environ.get("LAKERS_REFRESH_INTERVAL", "900"))
 
 # Map TEAM_ID -> team abbreviation so we can describe the opponent
 TEAMS_LIST = nba_teams.get_teams()
 TEAM_ID_TO_ABBR = {t["id"]: t["abbreviation"] for t in TEAMS_LIST}
-
-
-def _load_joblib(path: str):
-    if os.path.exists(path):
-        return joblib.load(path)
-    print(f"Warning: file not found at {path}")
-    return None
-
-
-model = _load_joblib(MODEL_PATH)
-scaler = _load_joblib(SCALER_PATH)
-feature_columns = _load_joblib(FEATURE_COLS_PATH)
-
-if os.path.exists(ROLLING_DATA_PATH):
-    all_games_df = pd.read_csv(ROLLING_DATA_PATH)
-    all_games_df["GAME_DATE"] = pd.to_datetime(all_games_df["GAME_DATE"])
+ABBR_TO_TEAM_ID = {abbr: team_id for team_id, abbr in TEAM_ID_TO_ABBR.items()}
+
+# Initial snapshot from local files only (no network); the worker fills in predictions.
+# Handlers read store.current() once per request and never see a half-built state.
+store = SnapshotStore(build_snapshot(None, TEAM_ID_TO_ABBR, pull_games=False, score_games=False))
+refresh_worker = RefreshWorker(store, TEAM_ID_TO_ABBR, REFRESH_INTERVAL)
+if REFRESH_INTERVAL > 0:
+    refresh_worker.start()
 else:
-    all_games_df = None
-    print(f"Warning: Rolling dataset not found at {ROLLING_DATA_PATH}")
-
-
-
-# Helpers
-def _prepare_feature_array(raw_features) -> np.ndarray:
-    """Validate and order incoming features, returning the scaled array."""
-    if feature_columns:
-        if isinstance(raw_features, dict):
-            missing = [col for col in feature_columns if col not in raw_features]
-            if missing:
-                raise ValueError(f"Missing feature values for: {missing}")
-            ordered_values = [raw_features[col] for col in feature_columns]
-        else:
-            ordered_values = list(raw_features)
-            if len(ordered_values) != len(feature_columns):
-                raise ValueError(
-                    f"Expected {len(feature_columns)} feature values but received {len(ordered_values)}"
-                )
-    else:
-        ordered_values = np.array(raw_features).reshape(-1).tolist()
-
-    features = np.array(ordered_values, dtype=float).reshape(1, -1)
-
-    if scaler is not None and feature_columns:
-        features_df = pd.DataFrame(features, columns=feature_columns)
-        features = scaler.transform(features_df)
-
-    return features
-
-
-def _predict_from_features(features: np.ndarray):
-    """Return (prediction_int, win_probability_float)."""
-    if model is None:
-        raise RuntimeError("Model not loaded")
-
-    prediction_raw = model.predict(features)[0]
-    class_probs = model.predict_proba(features)[0]
-    model_classes = list(getattr(model, "classes_", []))
-
-    if model_classes:
-        if 1 in model_classes:
-            target_class = 1
-        elif "W" in model_classes:
-            target_class = "W"
-        else:
-            target_class = model_classes[-1]
-        prob_index = model_classes.index(target_class)
-        probability = float(class_probs[prob_index])
-    else:
-        probability = float(class_probs[-1])
-
-    prediction = 1 if prediction_raw in (1, "W", True) else 0
-    return prediction, probability
-
-
-def find_next_lakers_game(max_days_ahead: int = 30):
-    """Use nba_api scoreboard endpoint to find the next scheduled Lakers game."""
-    today = datetime.today().date()
-
-    for i in range(max_days_ahead):
-        target_date = today + timedelta(days=i)
-        date_str = target_date.strftime("%m/%d/%Y")
+    # No background refreshes: score the schedule once so /next-game-prediction still answers
+    refresh_worker.refresh_once()
+
+# Live in-game probabilities: "api" follows today's games on the NBA live API,
+# a file path replays recorded play-by-play; unset disables the /live endpoints.
+# The tracker runs inside this process and every SSE client holds a thread, so
+# live mode needs ONE process with threads (e.g. gunicorn -w 1 -k gthread --threads 64);
+# with several workers each would poll the feed and see only its own clients.
+LIVE_FEED = os.environ.get("LAKERS_LIVE_FEED", "")
+LIVE_POLL_INTERVAL = float(os.environ.get("LAKERS_LIVE_POLL_INTERVAL", "5"))
+SSE_KEEPALIVE_SECONDS = 15
+
+live_tracker = None
+if LIVE_FEED:
+    live_tracker = LiveTracker(
+        create_feed(LIVE_FEED),
+        LIVE_POLL_INTERVAL,
+        # Lakers games start from the model's pre-game prediction
+        pregame_fn=lambda info: pregame_home_probability(info, store.current().upcoming, ABBR_TO_TEAM_ID["LAL"]),
+    )
+    live_tracker.start()
 
-        try:
-            sb = ScoreboardV2(game_date=date_str)
-            games = sb.game_header.get_data_frame()
-        except Exception:
-            continue
 
-        mask = (games["HOME_TEAM_ID"] == LAKERS_TEAM_ID) | (games["VISITOR_TEAM_ID"] == LAKERS_TEAM_ID)
-        lal_games = games[mask]
 
-        if not lal_games.empty:
-            game = lal_games.iloc[0]
-            home_id = int(game["HOME_TEAM_ID"])
-            visitor_id = int(game["VISITOR_TEAM_ID"])
+# Routes
+@app.route("/")
+def index():
+    return jsonify({"status": "ok", "message": "Lakers win predictor backend running"}), 200
 
-            if home_id == LAKERS_TEAM_ID:
-                home_flag = 1
-                opponent_id = visitor_id
-            else:
-                home_flag = 0
-                opponent_id = home_id
 
-            return target_date, home_flag, opponent_id
+def _snapshot_etag():
+    # Snapshots are immutable, so their version fully determines these responses
+    return store.current().version
 
-    raise RuntimeError("No upcoming Lakers game found in next 30 days.")
 
+def _refresh_status_etag():
+    # /health also reports when the last refresh ran and whether it failed
+    last_at = store.last_refresh_at.isoformat() if store.last_refresh_at else None
+    return make_etag(store.current().version, last_at, store.last_refresh_error)
 
 
-# Routes
-@app.route("/")
-def index():
-    return jsonify({"status": "ok", "message": "Lakers win predictor backend running"}), 200
+def _next_game_etag():
+    # The 503 body carries the last refresh error
+    return make_etag(store.current().version, store.last_refresh_error)
 
 
 @app.route("/health", methods=["GET"])
+@conditional(_refresh_status_etag)
 def health():
-    if model is None:
+    snap = store.current()
+    if snap.model is None:
         return jsonify({"status": "error", "error": "Model not loaded"}), 500
-    if all_games_df is None:
-        return jsonify({"status": "error", "error": "Rolling dataset not loaded"}), 500
-    return jsonify({"status": "ok"}), 200
+    if snap.all_games_df is None:
+        return jsonify({"status": "error", "error": "Game data not loaded"}), 500
+    return jsonify({
+        "status": "ok",
+        "snapshot": snap.version,
+        "last_refresh_at": store.last_refresh_at.isoformat(timespec="seconds") if store.last_refresh_at else None,
+        "last_refresh_error": store.last_refresh_error,
+    }), 200
 
 
 @app.route("/predict", methods=["POST"])
@@ -163,9 +110,10 @@ def predict():
     if raw_features is None:
         return jsonify({"error": "Missing 'features' in request"}), 400
 
+    snap = store.current()
     try:
-        features = _prepare_feature_array(raw_features)
-        prediction, probability = _predict_from_features(features)
+        features = prepare_feature_array(raw_features, snap.feature_columns, snap.scaler)
+        prediction, probability = predict_from_features(snap.model, features)
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
     except RuntimeError as exc:
@@ -179,45 +127,168 @@ def predict():
     }), 200
 
 
-@app.route("/next-game-prediction", methods=["GET"])
-def next_game_prediction():
-    if all_games_df is None:
-        return jsonify({"error": "Rolling dataset not loaded"}), 500
+@app.route("/explain", methods=["POST"])
+def explain():
+    """
+    Per-feature contributions to the win probability.
+
+    Body: {"features": <row>} for one prediction or {"batch": [<row>, ...]};
+    rows are dicts keyed by feature name or lists in feature_columns order.
+    """
+    data = request.get_json(silent=True) or {}
+    batch = data.get("batch")
+    single = batch is None
+    rows = [data.get("features")] if single else batch
+    if rows == [None] or not isinstance(rows, list) or not rows:
+        return jsonify({"error": "Provide 'features' (one row) or a non-empty 'batch' list"}), 400
+
+    snap = store.current()
+    if snap.explainer is None:
+        return jsonify({"error": "Explanations not available for the loaded model"}), 500
 
     try:
-        game_date, home_flag, opponent_id = find_next_lakers_game()
-    except RuntimeError as exc:
-        return jsonify({"error": str(exc)}), 500
+        features = prepare_feature_matrix(rows, snap.feature_columns, snap.scaler)
+        base_value, contributions, probabilities = snap.explainer.explain(features)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except Exception as exc:
+        return jsonify({"error": f"Explanation failed: {exc}"}), 500
+
+    columns = snap.feature_columns or [f"f{i}" for i in range(contributions.shape[1])]
+    explanations = [
+        {
+            "win_probability": float(prob),
+            "base_value": base_value,
+            "contributions": dict(zip(columns, row.tolist())),
+        }
+        for row, prob in zip(contributions, probabilities)
+    ]
+
+    if single:
+        return jsonify(explanations[0]), 200
+    return jsonify({"explanations": explanations}), 200
+
+
+def _resolve_team(value: str):
+    if value.isdigit():
+        return int(value) if int(value) in TEAM_ID_TO_ABBR else None
+    return ABBR_TO_TEAM_ID.get(value.upper())
+
+
+@app.route("/history", methods=["GET"])
+@conditional(_snapshot_etag)
+def history():
+    """
+    A team's games and rolling features over a date range, streamed as JSON.
+
+    Query params: team (abbreviation or id, default LAL), start/end
+    (YYYY-MM-DD, inclusive), columns (comma-separated projection),
+    include_predictions=1, limit (default 500), cursor (from next_cursor).
+    """
+    snap = store.current()
+    index = snap.team_index
+    if index is None:
+        return jsonify({"error": "Game data not loaded"}), 500
+
+    team_id = _resolve_team(request.args.get("team", "LAL"))
+    if team_id is None:
+        return jsonify({"error": "Unknown team"}), 404
+
+    if request.args.get("columns"):
+        columns = [c.strip() for c in request.args["columns"].split(",") if c.strip()]
+        unknown = [c for c in columns if c not in index.columns]
+        if unknown:
+            return jsonify({"error": f"Unknown columns: {unknown}"}), 400
+        columns = ["GAME_DATE"] + [c for c in columns if c != "GAME_DATE"]
+    else:
+        columns = [c for c in DEFAULT_COLUMNS if c in index.columns]
+
+    try:
+        start = pd.Timestamp(request.args["start"]) if request.args.get("start") else None
+        end = pd.Timestamp(request.args["end"]) if request.args.get("end") else None
+        limit = int(request.args.get("limit", DEFAULT_LIMIT))
+        if request.args.get("cursor"):
+            cursor_team, start = decode_cursor(request.args["cursor"])
+            if cursor_team != team_id:
+                raise ValueError("Cursor belongs to a different team")
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if not 1 <= limit <= MAX_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {MAX_LIMIT}"}), 400
+
+    lo, hi = index.date_range(team_id, start, end)
+    page_hi = min(hi, lo + limit)
+    next_cursor = encode_cursor(team_id, index.column("GAME_DATE")[page_hi]) if page_hi < hi else None
+
+    include_predictions = request.args.get("include_predictions", "").lower() in ("1", "true", "yes")
+    if include_predictions and snap.past_predictions is None:
+        return jsonify({"error": "Past predictions not available"}), 500
 
-    features_vector = build_features_for_matchup(
-        all_games_df=all_games_df,
-        game_date=game_date,
-        lakers_team_id=LAKERS_TEAM_ID,
-        opponent_team_id=opponent_id,
-        home_flag=home_flag,
+    body = iter_history_json(
+        index, team_id, TEAM_ID_TO_ABBR[team_id], lo, page_hi, columns,
+        next_cursor=next_cursor,
+        predictions=snap.past_predictions if include_predictions else None,
     )
+    return Response(body, mimetype="application/json")
 
-    if feature_columns:
-        raw_features = dict(zip(feature_columns, features_vector))
-    else:
-        raw_features = features_vector
 
+def _live_disabled():
+    return jsonify({"error": "Live mode is disabled (set LAKERS_LIVE_FEED)"}), 503
+
+
+@app.route("/live", methods=["GET"])
+def live_games():
+    """Latest in-game win probability for every game being followed."""
+    if live_tracker is None:
+        return _live_disabled()
+    return jsonify({"games": live_tracker.current(), "error": live_tracker.last_error}), 200
+
+
+def _sse_stream(subscription, initial):
     try:
-        features = _prepare_feature_array(raw_features)
-        prediction, probability = _predict_from_features(features)
-    except Exception as exc:
-        return jsonify({"error": f"Failed to score next game: {exc}"}), 500
+        for update in initial:
+            yield sse_event(update)
+        while True:
+            try:
+                update = subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            yield sse_event(update)
+    finally:
+        live_tracker.unsubscribe(subscription)
+
+
+@app.route("/live/stream", methods=["GET"])
+@app.route("/live/<game_id>/stream", methods=["GET"])
+def live_stream(game_id=None):
+    """Server-Sent Events: current state first, then one event per update."""
+    if live_tracker is None:
+        return _live_disabled()
+    subscription = live_tracker.subscribe(game_id)
+    body = _sse_stream(subscription, live_tracker.current(game_id))
+    response = Response(body, mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
-    opponent_abbr = TEAM_ID_TO_ABBR.get(opponent_id, "UNKNOWN")
 
-    return jsonify({
-        "opponent": opponent_abbr,
-        "opponent_id": opponent_id,
-        "game_date": game_date.isoformat(),
-        "home": bool(home_flag),
-        "prediction": prediction,
-        "win_probability": probability
-    }), 200
+@app.route("/next-game-prediction", methods=["GET"])
+@conditional(_next_game_etag, cache_control=f"public, max-age={PREDICTION_MAX_AGE}, must-revalidate")
+def next_game_prediction():
+    snap = store.current()
+    if snap.all_games_df is None:
+        return jsonify({"error": "Game data not loaded"}), 500
+
+    if snap.next_game is not None:
+        return jsonify(snap.next_game), 200
+    if snap.next_game_error:
+        return jsonify({"error": snap.next_game_error}), 500
+
+    # No refresh has scored the schedule yet
+    response = jsonify({"error": "Prediction not ready yet", "refresh_error": store.last_refresh_error})
+    response.headers["Retry-After"] = "5"
+    return response, 503
 
 
 if __name__ == "__main__":
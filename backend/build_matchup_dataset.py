@@ -1,5 +1,5 @@
 
-import os
+import argparse
 import re
 import time
 from collections import defaultdict
@@ -8,15 +8,28 @@ import pandas as pd
 from nba_api.stats.endpoints import LeagueGameLog
 from nba_api.stats.static import teams as nba_teams
 
+from game_store import GameStore
+from player_features import load_index as load_player_index, matchup_player_features
+from streaming import CarryOver, IncrementalCsvWriter, OrderGuard, iter_csv_chunks
+
 # ---------- CONFIG ----------
 INPUT_CSV = "data/lakers_past_seasons.csv"         # your combined file
 OUTPUT_CSV = "data/lakers_matchup_dataset.csv"
-CACHE_DIR = "team_game_logs"                  # caches each team's season logs
 ROLL_WINDOW = 5                               # last N games to use for rolling features
 SLEEP_BETWEEN_API_CALLS = 0.8                 # seconds - polite to NBA API
+CHUNK_SIZE = None                             # Lakers rows per chunk; None = load everything in memory
+LAKERS_TEAM_ID = 1610612747                   # used when the input has no TEAM_ID column
 # ----------------------------
 
-os.makedirs(CACHE_DIR, exist_ok=True)
+_game_store = None
+_refetched_seasons = set()
+
+def get_game_store():
+    """Shared GameStore, opened on first use."""
+    global _game_store
+    if _game_store is None:
+        _game_store = GameStore()
+    return _game_store
 
 def load_lakers_df(path):
     df = pd.read_csv(path)
@@ -47,32 +60,41 @@ def parse_opponent_abbr(matchup):
     except Exception:
         return None
 
-def get_team_season_log(team_id, season):
+def season_is_behind(season, game_date):
+    """True if the store's copy of `season` ends before `game_date` and was not re-fetched yet."""
+    if season in _refetched_seasons or game_date is None:
+        return False
+    latest = get_game_store().max_date(season)
+    return latest is not None and latest < game_date
+
+def get_team_season_log(team_id, season, game_date=None):
     """
     Return a DataFrame for team_id-season.
-    Caches to CSV as <CACHE_DIR>/<team_id>_<season>.csv
+    Read from the game store; on a miss the whole league season is fetched
+    once and appended to the store, so the other 29 teams are served locally.
+    The season is also re-fetched (once per run) when the store ends before
+    `game_date`, i.e. games were played since it was last updated.
     """
-    safe_season = season.replace('-', '_')
-    fn = os.path.join(CACHE_DIR, f"{team_id}_{safe_season}.csv")
-    if os.path.exists(fn):
-        df = pd.read_csv(fn)
-        df['GAME_DATE'] = pd.to_datetime(df['GAME_DATE'], errors='coerce')
+    store = get_game_store()
+    df = store.read_team_season(team_id, season)
+    if not df.empty and not season_is_behind(season, game_date):
         return df
 
     # Fetch from nba_api
-    print(f"Fetching team {team_id} season {season} from API...")
+    reason = f"store ends before {game_date:%Y-%m-%d}" if not df.empty else f"team {team_id} not in game store"
+    print(f"Fetching season {season} from API ({reason})...")
+    _refetched_seasons.add(season)
     try:
         gamelog = LeagueGameLog(season=season)
-        df = gamelog.get_data_frames()[0]
-        df = df[df['TEAM_ID'] == team_id]
-        df['GAME_DATE'] = pd.to_datetime(df['GAME_DATE'], errors='coerce')
-        df.to_csv(fn, index=False)
+        league = gamelog.get_data_frames()[0]
+        league['SEASON'] = season
+        store.append(league)
         # be polite
         time.sleep(SLEEP_BETWEEN_API_CALLS)
-        return df
+        return store.read_team_season(team_id, season)
     except Exception as e:
         print(f"Error fetching team {team_id} season {season}: {e}")
-        return pd.DataFrame()  # empty DataFrame fallback
+        return df  # stored rows (possibly empty) as fallback
 
 def compute_rolling_stats_from_log(df_log, current_date, stats, window=ROLL_WINDOW):
     """
@@ -93,20 +115,8 @@ def compute_rolling_stats_from_log(df_log, current_date, stats, window=ROLL_WIND
             means[stat] = 0.0
     return means
 
-def main():
-    # Load Lakers data
-    print("Loading Lakers data...")
-    ldf = load_lakers_df(INPUT_CSV)
-    print("Initial rows:", len(ldf))
-
-    # Build abbreviation -> team id mapping
-    abbr_to_id = build_abbr_to_id_map()
-
-    # Standard stat columns to pull rolling means for
-    candidate_stats = ['PTS', 'REB', 'AST', 'STL', 'BLK', 'FG_PCT', 'FG3_PCT', 'FT_PCT', 'TOV']
-    # Keep only those present in Lakers df and in opponent logs later
-    candidate_stats = [s for s in candidate_stats if s in ldf.columns]
-
+def add_lakers_row_features(ldf, abbr_to_id):
+    """Per-row columns: HOME, OPP_ABBR, OPP_TEAM_ID."""
     # Add basic columns: HOME, OPP_ABBR, OPP_TEAM_ID
     ldf['HOME'] = ldf['MATCHUP'].apply(lambda x: 1 if 'vs.' in str(x) or 'vs ' in str(x) else 0)
     ldf['OPP_ABBR'] = ldf['MATCHUP'].apply(parse_opponent_abbr)
@@ -114,15 +124,18 @@ def main():
 
     # Map opponent abbreviation to team id (if unknown, will be NaN)
     ldf['OPP_TEAM_ID'] = ldf['OPP_ABBR'].map(lambda a: abbr_to_id.get(a, pd.NA))
+    return ldf
 
+def warn_unknown_abbrs(ldf):
     # Check for any unknown abbreviations
     unknown_abbrs = sorted(set(ldf[ldf['OPP_TEAM_ID'].isna()]['OPP_ABBR'].unique()))
     if unknown_abbrs:
         print("Warning: unknown opponent abbreviations found:", unknown_abbrs)
         print("You may need to inspect MATCHUP formatting. Unknown teams will get missing opponent features set to 0.")
 
+def add_lakers_window_features(ldf, stats_for_rolling):
+    """Lakers rolling stats and rest days; each row looks back at most ROLL_WINDOW games."""
     # Compute Lakers rolling features (exclude current game by shifting)
-    stats_for_rolling = [s for s in ['PTS', 'REB', 'AST', 'STL', 'BLK'] if s in ldf.columns]
     for stat in stats_for_rolling:
         # shift by 1 to exclude current game, then rolling
         ldf[f'L_{stat}_ROLL{ROLL_WINDOW}'] = ldf[stat].shift(1).rolling(window=ROLL_WINDOW, min_periods=1).mean().fillna(0)
@@ -131,15 +144,28 @@ def main():
     ldf['L_PREV_DATE'] = ldf['GAME_DATE'].shift(1)
     ldf['L_DAYS_REST'] = (ldf['GAME_DATE'] - ldf['L_PREV_DATE']).dt.days.fillna(999).astype(int)
     ldf['L_BACK_TO_BACK'] = (ldf['L_DAYS_REST'] == 1).astype(int)
+    return ldf
+
+def player_features_for_rows(ldf, player_index):
+    """L_/O_ player-availability columns aligned with `ldf` (None if no player data)."""
+    if player_index is None:
+        return None
+    team_ids = ldf['TEAM_ID'] if 'TEAM_ID' in ldf.columns else [LAKERS_TEAM_ID] * len(ldf)
+    return matchup_player_features(player_index, team_ids, ldf['OPP_TEAM_ID'], ldf['GAME_DATE'])
+
+def build_matchup_rows(ldf, stats_for_rolling, opp_log_cache, progress=None, extra_features=None):
+    """
+    Turn Lakers rows (with window features) into matchup rows.
 
-    # Prepare output rows
+    `opp_log_cache` maps (team_id, season) -> season log and is filled as needed.
+    `progress` is an optional (done_before, total) tuple used for log lines.
+    `extra_features` is an optional DataFrame aligned with `ldf` whose columns
+    are appended as-is (e.g. player availability).
+    """
     out_rows = []
-    # cache for opponent season logs: {(team_id, season): df}
-    opp_log_cache = {}
+    done_before, total = progress if progress else (0, len(ldf))
 
-    total = len(ldf)
-    print("Building matchup rows for each Lakers game...")
-    for idx, row in ldf.iterrows():
+    for i, (_, row) in enumerate(ldf.iterrows()):
         season = row.get('SEASON')
         game_date = row['GAME_DATE']
         opp_id = row['OPP_TEAM_ID']
@@ -166,8 +192,12 @@ def main():
 
         if pd.notna(opp_id):
             key = (int(opp_id), season)
+            if key in opp_log_cache and season_is_behind(season, game_date):
+                # Cached logs predate this game; a re-fetch updates every team of the season
+                for stale in [k for k in opp_log_cache if k[1] == season]:
+                    del opp_log_cache[stale]
             if key not in opp_log_cache:
-                opp_df = get_team_season_log(int(opp_id), season)
+                opp_df = get_team_season_log(int(opp_id), season, game_date)
                 opp_log_cache[key] = opp_df
             else:
                 opp_df = opp_log_cache[key]
@@ -197,13 +227,50 @@ def main():
         out_rows.append(combined)
 
         # Progress indicator occasionally
-        if (idx + 1) % 25 == 0 or (idx + 1) == total:
-            print(f"Processed {idx+1}/{total} games...")
+        done = done_before + i + 1
+        if done % 25 == 0 or done == total:
+            print(f"Processed {done}/{total} games...")
 
-    # Build DataFrame and save
+    # Build DataFrame
     out_df = pd.DataFrame(out_rows)
+    if extra_features is not None:
+        out_df = pd.concat([out_df, extra_features.reset_index(drop=True)], axis=1)
+    if out_df.empty:
+        return out_df
     # Drop rows where GAME_DATE is NaT (if any)
-    out_df = out_df.dropna(subset=['GAME_DATE']).reset_index(drop=True)
+    return out_df.dropna(subset=['GAME_DATE']).reset_index(drop=True)
+
+def main_in_memory():
+    # Load Lakers data
+    print("Loading Lakers data...")
+    ldf = load_lakers_df(INPUT_CSV)
+    print("Initial rows:", len(ldf))
+
+    # Build abbreviation -> team id mapping
+    abbr_to_id = build_abbr_to_id_map()
+
+    # Standard stat columns to pull rolling means for
+    candidate_stats = ['PTS', 'REB', 'AST', 'STL', 'BLK', 'FG_PCT', 'FG3_PCT', 'FT_PCT', 'TOV']
+    # Keep only those present in Lakers df and in opponent logs later
+    candidate_stats = [s for s in candidate_stats if s in ldf.columns]
+
+    ldf = add_lakers_row_features(ldf, abbr_to_id)
+    warn_unknown_abbrs(ldf)
+
+    stats_for_rolling = [s for s in ['PTS', 'REB', 'AST', 'STL', 'BLK'] if s in ldf.columns]
+    ldf = add_lakers_window_features(ldf, stats_for_rolling)
+
+    # Player availability (only when player logs have been collected)
+    player_index = load_player_index()
+    if player_index is not None:
+        print("Joining player-availability features...")
+
+    # cache for opponent season logs: {(team_id, season): df}
+    opp_log_cache = {}
+
+    print("Building matchup rows for each Lakers game...")
+    out_df = build_matchup_rows(ldf, stats_for_rolling, opp_log_cache,
+                                extra_features=player_features_for_rows(ldf, player_index))
 
     # Save
     out_df.to_csv(OUTPUT_CSV, index=False)
@@ -211,5 +278,58 @@ def main():
     print("Columns:", out_df.columns.tolist())
     print("Rows:", len(out_df))
 
+def main_streaming(chunk_size):
+    """
+    Chunked equivalent of main_in_memory.
+
+    Lakers rows are read `chunk_size` at a time (input must be in date order),
+    the rolling/rest state is carried between chunks, and only the current
+    season's opponent logs are kept cached. Output is appended per chunk.
+    """
+    print(f"Streaming Lakers data in chunks of {chunk_size} rows...")
+    abbr_to_id = build_abbr_to_id_map()
+    order = OrderGuard()
+    carry = CarryOver(lookback=ROLL_WINDOW)
+    opp_log_cache = {}
+    player_index = load_player_index()
+    stats_for_rolling = None
+    done = 0
+
+    with IncrementalCsvWriter(OUTPUT_CSV) as writer:
+        for chunk in iter_csv_chunks(INPUT_CSV, chunk_size):
+            if stats_for_rolling is None:
+                stats_for_rolling = [s for s in ['PTS', 'REB', 'AST', 'STL', 'BLK'] if s in chunk.columns]
+            order.check(chunk)
+
+            chunk = add_lakers_row_features(chunk, abbr_to_id)
+            warn_unknown_abbrs(chunk)
+            chunk = carry.apply(chunk, lambda df: add_lakers_window_features(df, stats_for_rolling))
+
+            # Seasons arrive in order, so older opponent logs can be dropped
+            seasons = set(chunk['SEASON'].dropna().unique())
+            for key in [k for k in opp_log_cache if k[1] not in seasons]:
+                del opp_log_cache[key]
+
+            out_df = build_matchup_rows(chunk, stats_for_rolling, opp_log_cache, progress=(done, "?"),
+                                        extra_features=player_features_for_rows(chunk, player_index))
+            done += len(chunk)
+            if not out_df.empty:
+                writer.write(out_df)
+
+    print(f"\nMatchup dataset saved to {OUTPUT_CSV}")
+    print("Columns:", writer.columns)
+    print("Rows:", writer.rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Lakers matchup dataset.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="process Lakers games in chunks of this many rows")
+    args = parser.parse_args()
+
+    if args.chunk_size:
+        main_streaming(args.chunk_size)
+    else:
+        main_in_memory()
+
 if __name__ == "__main__":
     main()
@@ -1,54 +1,123 @@
+import argparse
 
 import pandas as pd
 
-# Load your Lakers data
-df = pd.read_csv("data/lakers_past_seasons.csv")
+from streaming import CarryOver, DuplicateFilter, IncrementalCsvWriter, OrderGuard, iter_csv_chunks
 
-print("Initial shape:", df.shape)
-print("Columns:", df.columns.tolist())
+# ---------- CONFIG ----------
+INPUT_CSV = "data/lakers_past_seasons.csv"
+OUTPUT_CSV = "data/lakers_cleaned.csv"
+ROLL_STATS = ['PTS', 'REB', 'AST', 'STL', 'BLK']
+ROLL_WINDOW = 5
+CHUNK_SIZE = None                             # rows per chunk; None = load the whole file in memory
+# ----------------------------
 
-# --- Basic cleanup ---
-# Drop duplicate rows if any
-df = df.drop_duplicates()
 
-# Convert GAME_DATE to datetime
-df['GAME_DATE'] = pd.to_datetime(df['GAME_DATE'], errors='coerce')
+def add_row_features(df):
+    """Per-row feature engineering (safe to run on any chunk independently)."""
+    # Convert GAME_DATE to datetime
+    df['GAME_DATE'] = pd.to_datetime(df['GAME_DATE'], errors='coerce')
 
-# Create a SEASON column (based on year)
-df['SEASON'] = df['GAME_DATE'].apply(lambda x: f"{x.year}-{x.year+1}" if x.month >= 10 else f"{x.year-1}-{x.year}")
+    # Create a SEASON column (based on year)
+    df['SEASON'] = df['GAME_DATE'].apply(lambda x: f"{x.year}-{x.year+1}" if x.month >= 10 else f"{x.year-1}-{x.year}")
 
-# --- Feature Engineering ---
+    # 1. Create binary column for Home/Away
+    df['HOME'] = df['MATCHUP'].apply(lambda x: 1 if 'vs.' in x else 0)
 
-# 1. Create binary column for Home/Away
-df['HOME'] = df['MATCHUP'].apply(lambda x: 1 if 'vs.' in x else 0)
+    # 2. Extract opponent team name
+    df['OPPONENT'] = df['MATCHUP'].apply(lambda x: x.split()[-1])
 
-# 2. Extract opponent team name
-df['OPPONENT'] = df['MATCHUP'].apply(lambda x: x.split()[-1])
+    # 3. Convert Win/Loss to numeric
+    df['WL'] = df['WL'].map({'W': 1, 'L': 0})
+    return df
 
-# 3. Convert Win/Loss to numeric
-df['WL'] = df['WL'].map({'W': 1, 'L': 0})
 
-# 4. Sort games by date
-df = df.sort_values('GAME_DATE').reset_index(drop=True)
+def add_window_features(df):
+    """Features that look back over previous games (needs ROLL_WINDOW rows of history)."""
+    # 5. Create rolling averages (last 5 games for some key stats)
+    for stat in ROLL_STATS:
+        if stat in df.columns:
+            df[f'{stat}_ROLL5'] = df[stat].rolling(window=ROLL_WINDOW, min_periods=1).mean()
 
-# 5. Create rolling averages (last 5 games for some key stats)
-for stat in ['PTS', 'REB', 'AST', 'STL', 'BLK']:
-    if stat in df.columns:
-        df[f'{stat}_ROLL5'] = df[stat].rolling(window=5, min_periods=1).mean()
+    # 6. Create "Back-to-Back" indicator
+    df['BACK_TO_BACK'] = (df['GAME_DATE'].diff().dt.days == 1).astype(int)
+    return df
 
-# 6. Create "Back-to-Back" indicator
-df['BACK_TO_BACK'] = (df['GAME_DATE'].diff().dt.days == 1).astype(int)
 
-# --- Drop unnecessary columns ---
-cols_to_drop = ['GAME_ID', 'TEAM_ID', 'TEAM_ABBREVIATION']
-df = df.drop(columns=[col for col in cols_to_drop if col in df.columns], errors='ignore')
+def finalize(df):
+    # --- Drop unnecessary columns ---
+    cols_to_drop = ['GAME_ID', 'TEAM_ID', 'TEAM_ABBREVIATION']
+    df = df.drop(columns=[col for col in cols_to_drop if col in df.columns], errors='ignore')
 
-# --- Handle missing values ---
-df = df.fillna(0)
+    # --- Handle missing values ---
+    return df.fillna(0)
 
-# --- Save cleaned dataset ---
-output_path = "data/lakers_cleaned.csv"
-df.to_csv(output_path, index=False)
-print(f"\nCleaned data saved to {output_path}")
-print("Final shape:", df.shape)
-print(df.head())
+
+def clean_in_memory(input_path, output_path):
+    # Load your Lakers data
+    df = pd.read_csv(input_path)
+
+    print("Initial shape:", df.shape)
+    print("Columns:", df.columns.tolist())
+
+    # --- Basic cleanup ---
+    # Drop duplicate rows if any
+    df = df.drop_duplicates()
+
+    # --- Feature Engineering ---
+    df = add_row_features(df)
+
+    # 4. Sort games by date
+    df = df.sort_values('GAME_DATE').reset_index(drop=True)
+
+    df = add_window_features(df)
+    df = finalize(df)
+
+    # --- Save cleaned dataset ---
+    df.to_csv(output_path, index=False)
+    print(f"\nCleaned data saved to {output_path}")
+    print("Final shape:", df.shape)
+    print(df.head())
+
+
+def clean_streaming(input_path, output_path, chunk_size):
+    """
+    Same transformation as clean_in_memory, one chunk at a time.
+
+    Input must already be in GAME_DATE order (the fetch scripts write it that
+    way); rolling/back-to-back state is carried across chunk boundaries.
+    """
+    dedup = DuplicateFilter()
+    order = OrderGuard()
+    carry = CarryOver(lookback=ROLL_WINDOW)
+
+    print(f"Streaming {input_path} in chunks of {chunk_size} rows...")
+    with IncrementalCsvWriter(output_path) as writer:
+        # Dates are parsed in add_row_features, after de-duplication on the raw values
+        for chunk in iter_csv_chunks(input_path, chunk_size, date_col=None):
+            chunk = dedup.filter(chunk)
+            if chunk.empty:
+                continue
+            chunk = add_row_features(chunk)
+            order.check(chunk)
+            chunk = carry.apply(chunk, add_window_features)
+            writer.write(finalize(chunk))
+
+    print(f"\nCleaned data saved to {output_path}")
+    print("Final shape:", (writer.rows, len(writer.columns or [])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean the Lakers game log CSV.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="process the input in chunks of this many rows")
+    args = parser.parse_args()
+
+    if args.chunk_size:
+        clean_streaming(INPUT_CSV, OUTPUT_CSV, args.chunk_size)
+    else:
+        clean_in_memory(INPUT_CSV, OUTPUT_CSV)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,36 @@
 import pandas as pd
 from datetime import datetime
 
+from player_features import PLAYER_FEATURE_COLUMNS
+
 # Stats we will average over the last 5 games
 STATS = ["PTS", "REB", "AST", "STL", "BLK"]
 
-
-def _compute_team_last5_features(all_games_df: pd.DataFrame, team_id: int, game_date: pd.Timestamp):
+# Order of the 15 team-level features returned by build_features_for_matchup
+BASE_FEATURE_COLUMNS = [
+    "HOME",
+    "L_BACK_TO_BACK",
+    "L_DAYS_REST",
+    "L_PTS_ROLL5",
+    "L_REB_ROLL5",
+    "L_AST_ROLL5",
+    "L_STL_ROLL5",
+    "L_BLK_ROLL5",
+    "O_PTS_ROLL5",
+    "O_REB_ROLL5",
+    "O_AST_ROLL5",
+    "O_STL_ROLL5",
+    "O_BLK_ROLL5",
+    "O_BACK_TO_BACK",
+    "O_DAYS_REST",
+]
+
+
+def _compute_team_last5_features(all_games_df: pd.DataFrame, team_id: int, game_date: pd.Timestamp,
+                                 team_index=None):
     """
-    Given the full all-teams DataFrame, a team_id, and a game_date,
-    compute:
+    Given the full all-teams DataFrame (or a TeamGameIndex over it), a team_id,
+    and a game_date, compute:
       - last 5-game averages for PTS, REB, AST, STL, BLK
       - days of rest before game_date
       - back-to-back flag
@@ -20,10 +42,14 @@ def _compute_team_last5_features(all_games_df: pd.DataFrame, team_id: int, game_
         game_date = pd.to_datetime(game_date)
 
     # Filter for this team's games BEFORE the game_date
-    team_games = all_games_df[
-        (all_games_df["TEAM_ID"] == team_id) &
-        (all_games_df["GAME_DATE"] < game_date)
-    ].sort_values("GAME_DATE")
+    if team_index is not None:
+        # Already sorted per team; only the last 5 rows are needed
+        team_games = team_index.prior_games(team_id, game_date, n=5)
+    else:
+        team_games = all_games_df[
+            (all_games_df["TEAM_ID"] == team_id) &
+            (all_games_df["GAME_DATE"] < game_date)
+        ].sort_values("GAME_DATE")
 
     features = {}
 
@@ -59,6 +85,8 @@ def build_features_for_matchup(
     lakers_team_id: int,
     opponent_team_id: int,
     home_flag: int,
+    player_index=None,
+    team_index=None,
 ):
     """
     Build the 15-element feature vector for the model:
@@ -78,15 +106,21 @@ def build_features_for_matchup(
      O_BLK_ROLL5,
      O_BACK_TO_BACK,
      O_DAYS_REST]
+
+    When a PlayerAvailabilityIndex is passed as `player_index`, the six
+    PLAYER_FEATURE_COLUMNS (Lakers then opponent availability, as of the day
+    before game_date) are appended, matching the matchup dataset layout.
+    Passing a TeamGameIndex as `team_index` replaces the full-frame filtering
+    with a per-team binary search (all_games_df is then not scanned).
     """
 
     if not isinstance(game_date, pd.Timestamp):
         game_date = pd.to_datetime(game_date)
 
     # Compute Lakers last-5 stats
-    lakers_feats = _compute_team_last5_features(all_games_df, lakers_team_id, game_date)
+    lakers_feats = _compute_team_last5_features(all_games_df, lakers_team_id, game_date, team_index)
     # Compute Opponent last-5 stats
-    opp_feats = _compute_team_last5_features(all_games_df, opponent_team_id, game_date)
+    opp_feats = _compute_team_last5_features(all_games_df, opponent_team_id, game_date, team_index)
 
     # Map into the exact feature order your model expects
     HOME = int(home_flag)
@@ -125,4 +159,11 @@ def build_features_for_matchup(
         O_DAYS_REST,
     ]
 
+    if player_index is not None:
+        lakers_avail = player_index.lookup(lakers_team_id, game_date)
+        opp_avail = player_index.lookup(opponent_team_id, game_date)
+        for col in PLAYER_FEATURE_COLUMNS:
+            source = lakers_avail if col.startswith("L_") else opp_avail
+            feature_vector.append(float(source[col[2:]]))
+
     return feature_vector
@@ -0,0 +1,316 @@
+# backend/game_store.py
+"""
+Single-file, append-only store for team game logs.
+
+The only on-disk copy of raw league game logs: get_all_team_data.py and the
+refresh worker append fetched seasons here; build_matchup_dataset.py reads
+opponent logs from it and the refresh worker derives its all-teams frame
+(rolling columns included) from it. Layout:
+
+  data/game_store.dat            concatenated segments; each segment is the
+                                 zlib-compressed, header-less CSV of new rows
+                                 for one (season, team) partition
+  data/game_store_manifest.json  columns, plus per partition: row count, date
+                                 range and its segments (offset, length, rows,
+                                 sha256 of the stored bytes)
+
+Readers open the data file once and seek to the segments they need; any
+number of partitions is parsed with a single read_csv call and one date
+parse. Writers only append bytes, then atomically replace the manifest, so
+a crash mid-write leaves the previous state readable. Appends hold an
+exclusive flock on the data file (plus a lock for threads sharing a
+GameStore) and re-read the manifest under it, so concurrent writers in
+several processes neither interleave segments nor drop each other's rows. Rows are unique per
+(TEAM_ID, GAME_ID) across the whole store.
+
+`python game_store.py build` imports the CSV copies older checkouts kept
+(team_game_logs/ and the data/all_teams_past_seasons*.csv files), if present;
+`python game_store.py export PATH` writes the whole store as one CSV;
+`python game_store.py verify` re-checks every checksum.
+"""
+
+import glob
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_PATH = os.path.join(BASE_DIR, "data", "game_store.dat")
+MANIFEST_PATH = os.path.join(BASE_DIR, "data", "game_store_manifest.json")
+# Pre-store copies, only read by `build`
+LEGACY_CACHE_DIR = os.path.join(BASE_DIR, "team_game_logs")
+LEGACY_LEAGUE_CSVS = [os.path.join(BASE_DIR, "data", "all_teams_past_seasons.csv"),
+                      os.path.join(BASE_DIR, "data", "all_teams_past_seasons_with_rolling.csv")]
+
+DATE_FORMAT = "%Y-%m-%d"
+# Read as text so values round-trip exactly (e.g. GAME_ID zero padding)
+TEXT_COLUMNS = {"GAME_ID": str, "SEASON_ID": str, "SEASON": str}
+
+
+def partition_key(season: str, team_id: int) -> str:
+    return f"{season}/{int(team_id)}"
+
+
+def season_from_season_id(season_id) -> str:
+    """LeagueGameLog SEASON_ID '22021' -> '2021-22'."""
+    start = int(str(season_id)[-4:])
+    return f"{start}-{str(start + 1)[2:]}"
+
+
+class GameStore:
+    """Read/append access to the store; safe to share between threads and to append from several processes."""
+
+    def __init__(self, store_path: str = STORE_PATH, manifest_path: str = MANIFEST_PATH):
+        self.store_path = store_path
+        self.manifest_path = manifest_path
+        self._lock = threading.RLock()
+        self._file = None
+        self.reload()
+
+    def reload(self):
+        """Re-read the manifest, picking up appends made by other processes."""
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"version": 1, "columns": None, "partitions": {}}
+
+    # ---------- reading ----------
+
+    @property
+    def columns(self):
+        return self.manifest["columns"]
+
+    def partitions(self, seasons=None, team_ids=None):
+        """Manifest entries matching the filters, in (season, team) order."""
+        seasons = set(seasons) if seasons is not None else None
+        team_ids = {int(t) for t in team_ids} if team_ids is not None else None
+        out = []
+        for key in sorted(self.manifest["partitions"]):
+            part = self.manifest["partitions"][key]
+            if seasons is not None and part["season"] not in seasons:
+                continue
+            if team_ids is not None and part["team_id"] not in team_ids:
+                continue
+            out.append(part)
+        return out
+
+    def _read_segments(self, segments, verify=False) -> bytes:
+        if not segments:
+            return b""
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.store_path, "rb")
+            chunks = []
+            for seg in sorted(segments, key=lambda s: s["offset"]):
+                self._file.seek(seg["offset"])
+                raw = self._file.read(seg["length"])
+                if verify and hashlib.sha256(raw).hexdigest() != seg["sha256"]:
+                    raise ValueError(f"Checksum mismatch in segment at offset {seg['offset']}")
+                chunks.append(zlib.decompress(raw))
+        return b"".join(chunks)
+
+    def read(self, seasons=None, team_ids=None, verify=False) -> pd.DataFrame:
+        """Rows for the selected partitions as one DataFrame (GAME_DATE parsed)."""
+        parts = self.partitions(seasons, team_ids)
+        segments = [seg for part in parts for seg in part["segments"]]
+        payload = self._read_segments(segments, verify=verify)
+        if not payload:
+            return pd.DataFrame(columns=self.columns or [])
+
+        dtypes = {c: t for c, t in TEXT_COLUMNS.items() if c in self.columns}
+        df = pd.read_csv(io.BytesIO(payload), header=None, names=self.columns, dtype=dtypes)
+        df["GAME_DATE"] = pd.to_datetime(df["GAME_DATE"], format=DATE_FORMAT)
+        return df
+
+    def read_team_season(self, team_id: int, season: str) -> pd.DataFrame:
+        return self.read(seasons=[season], team_ids=[team_id])
+
+    def max_date(self, season: str):
+        """Date of the newest stored game of `season` (any team), or None."""
+        dates = [part["max_date"] for part in self.partitions(seasons=[season]) if part["max_date"]]
+        return pd.Timestamp(max(dates)) if dates else None
+
+    def verify(self):
+        """Recompute every checksum and row count; returns a list of problems."""
+        problems = []
+        for part in self.partitions():
+            for seg in part["segments"]:
+                try:
+                    payload = self._read_segments([seg], verify=True)
+                except (ValueError, zlib.error) as exc:
+                    problems.append(f"{partition_key(part['season'], part['team_id'])}: {exc}")
+                    continue
+                rows = payload.count(b"\n")
+                if rows != seg["rows"]:
+                    problems.append(f"{partition_key(part['season'], part['team_id'])}: "
+                                    f"{rows} rows, manifest says {seg['rows']}")
+        return problems
+
+    # ---------- writing ----------
+
+    def _existing_game_ids(self, part) -> set:
+        if part is None:
+            return set()
+        payload = self._read_segments(part["segments"])
+        df = pd.read_csv(io.BytesIO(payload), header=None, names=self.columns, usecols=["GAME_ID"], dtype=str)
+        return set(df["GAME_ID"].astype(int))
+
+    def append(self, df: pd.DataFrame) -> int:
+        """
+        Append game-log rows (needs TEAM_ID, GAME_ID, GAME_DATE and SEASON or
+        SEASON_ID). Rows already stored for the same team/game are skipped.
+        Returns the number of rows written.
+        """
+        if df.empty:
+            return 0
+        df = df.copy()
+        if "SEASON" not in df.columns or df["SEASON"].isna().any():
+            derived = df["SEASON_ID"].map(season_from_season_id)
+            df["SEASON"] = df["SEASON"].fillna(derived) if "SEASON" in df.columns else derived
+        df["GAME_DATE"] = pd.to_datetime(df["GAME_DATE"]).dt.strftime(DATE_FORMAT)
+        df["_GAME_KEY"] = df["GAME_ID"].astype(int)
+        df = df.drop_duplicates(subset=["TEAM_ID", "_GAME_KEY"])
+
+        written = 0
+        with self._lock, open(self.store_path, "ab") as out:
+            if fcntl is not None:
+                fcntl.flock(out.fileno(), fcntl.LOCK_EX)
+            # Another process may have appended since this store was opened
+            self.reload()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+            new_manifest = json.loads(json.dumps(self.manifest))
+            if new_manifest["columns"] is None:
+                new_manifest["columns"] = [c for c in df.columns if c != "_GAME_KEY"]
+            columns = new_manifest["columns"]
+            extra = [c for c in df.columns if c not in columns and c != "_GAME_KEY"]
+            if extra:
+                print(f"Warning: game store ignores columns not in its schema: {extra}")
+
+            for (season, team_id), part_df in df.groupby(["SEASON", "TEAM_ID"], sort=True):
+                key = partition_key(season, team_id)
+                part = new_manifest["partitions"].get(key)
+                seen = self._existing_game_ids(self.manifest["partitions"].get(key))
+                part_df = part_df[~part_df["_GAME_KEY"].isin(seen)].sort_values("GAME_DATE", kind="stable")
+                if part_df.empty:
+                    continue
+
+                text = part_df.reindex(columns=columns).to_csv(index=False, header=False, lineterminator="\n")
+                raw = zlib.compress(text.encode("utf-8"), 6)
+                offset = out.seek(0, os.SEEK_END)
+                out.write(raw)
+
+                segment = {"offset": offset, "length": len(raw), "rows": int(len(part_df)),
+                           "sha256": hashlib.sha256(raw).hexdigest()}
+                if part is None:
+                    part = {"season": season, "team_id": int(team_id), "rows": 0,
+                            "min_date": None, "max_date": None, "segments": []}
+                    new_manifest["partitions"][key] = part
+                part["segments"].append(segment)
+                part["rows"] += segment["rows"]
+                dates = [d for d in (part["min_date"], part["max_date"]) if d] + part_df["GAME_DATE"].tolist()
+                part["min_date"], part["max_date"] = min(dates), max(dates)
+                written += segment["rows"]
+            if not written:
+                return 0
+            out.flush()
+            os.fsync(out.fileno())
+
+            # Replace the manifest before releasing the flock
+            manifest_dir = os.path.dirname(self.manifest_path) or "."
+            fd, tmp_path = tempfile.mkstemp(dir=manifest_dir, prefix=".manifest-", suffix=".json.partial")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(new_manifest, f, indent=1, sort_keys=True)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, self.manifest_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self.manifest = new_manifest
+        return written
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _legacy_team_logs():
+    """Yield (path, DataFrame) for every <team_id>_<season>.csv in the old cache dir."""
+    for path in sorted(glob.glob(os.path.join(LEGACY_CACHE_DIR, "*.csv"))):
+        name = os.path.basename(path)[:-4]
+        team_part, season_part = name.split("_", 1)
+        df = pd.read_csv(path, dtype=TEXT_COLUMNS)
+        df["SEASON"] = season_part.replace("_", "-")
+        yield path, df
+
+
+def export_csv(path: str, seasons=None, store: GameStore = None) -> int:
+    """Write the selected seasons as one CSV sorted by team and date; returns the row count."""
+    store = store or GameStore()
+    df = store.read(seasons=seasons)
+    df = df.sort_values(["TEAM_ID", "GAME_DATE"], kind="stable")
+    df.to_csv(path, index=False, date_format=DATE_FORMAT)
+    return len(df)
+
+
+def build_store():
+    """Import legacy league CSVs and the per-team cache into the store."""
+    store = GameStore()
+    total = 0
+    for path in LEGACY_LEAGUE_CSVS:
+        if os.path.exists(path):
+            added = store.append(pd.read_csv(path, dtype=TEXT_COLUMNS))
+            print(f"{os.path.relpath(path, BASE_DIR)}: {added} rows added")
+            total += added
+
+    legacy_files = legacy_rows = legacy_added = 0
+    for _, df in _legacy_team_logs():
+        legacy_files += 1
+        legacy_rows += len(df)
+        legacy_added += store.append(df)
+    print(f"{legacy_files} legacy team-season files: {legacy_rows} rows read, "
+          f"{legacy_added} not already in the league data")
+    total += legacy_added
+
+    parts = store.partitions()
+    print(f"Store: {sum(p['rows'] for p in parts)} rows in {len(parts)} partitions, "
+          f"{os.path.getsize(STORE_PATH)} bytes")
+    store.close()
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command == "build":
+        build_store()
+    elif command == "export" and len(sys.argv) > 2:
+        print(f"Exported {export_csv(sys.argv[2])} rows to {sys.argv[2]}")
+    elif command == "verify":
+        problems = GameStore().verify()
+        print("\n".join(problems) if problems else "All segments OK")
+        sys.exit(1 if problems else 0)
+    else:
+        print("usage: python game_store.py [build|export PATH|verify]")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,14 @@
+import argparse
+
 import pandas as pd
 from nba_api.stats.endpoints import LeagueGameLog
 import time
-import os
+
+from game_store import GameStore, export_csv
 
 # Seasons you want to collect
 SEASONS = ["2020-21", "2021-22", "2022-23", "2023-24", "2024-25"]
 
-# Make sure data folder exists
-if not os.path.exists("data"):
-    os.makedirs("data")
-
 def get_season_data(season):
     """Fetch game logs for one season."""
     print(f"Fetching season {season}...")
@@ -22,23 +21,51 @@ def get_season_data(season):
     logs["SEASON"] = season
     return logs
 
-all_data = []
+def fetch_in_memory(seasons, store):
+    all_data = []
+
+    # Loop through each season
+    for season in seasons:
+        df = get_season_data(season)
+        all_data.append(df)
+        time.sleep(1.2)  # to prevent API rate-limits
+
+    # Combine all seasons; the store skips games it already has
+    full_df = pd.concat(all_data, ignore_index=True)
+    return store.append(full_df)
 
-# Loop through each season
-for season in SEASONS:
-    df = get_season_data(season)
-    all_data.append(df)
-    time.sleep(1.2)  # to prevent API rate-limits
+def fetch_streaming(seasons, store):
+    """
+    Same result as fetch_in_memory, but each season is appended to the store
+    (partitioned by season and team) as soon as it arrives, so peak memory is
+    one season.
+    """
+    added = 0
+    for season in seasons:
+        df = get_season_data(season)
+        added += store.append(df)
+        del df
+        time.sleep(1.2)  # to prevent API rate-limits
+    return added
 
-# Combine all seasons
-full_df = pd.concat(all_data, ignore_index=True)
+def main():
+    parser = argparse.ArgumentParser(description="Fetch league-wide game logs for SEASONS into the game store.")
+    parser.add_argument("--stream", action="store_true",
+                        help="store each season as it arrives instead of holding every season in memory")
+    parser.add_argument("--csv", metavar="PATH",
+                        help="also export the fetched seasons from the store as one CSV (sorted by team and date)")
+    args = parser.parse_args()
 
-# Sort by team and date
-full_df["GAME_DATE"] = pd.to_datetime(full_df["GAME_DATE"])
-full_df = full_df.sort_values(["TEAM_ID", "GAME_DATE"])
+    store = GameStore()
+    if args.stream:
+        added = fetch_streaming(SEASONS, store)
+    else:
+        added = fetch_in_memory(SEASONS, store)
+    print(f"\nAdded {added} new team-game rows to {store.store_path}")
 
-# Save
-output_path = "data/all_teams_past_seasons.csv"
-full_df.to_csv(output_path, index=False)
+    if args.csv:
+        rows = export_csv(args.csv, seasons=SEASONS, store=store)
+        print(f"Exported {rows} rows to {args.csv}")
 
-print(f"\nSaved all team data to {output_path}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+from nba_api.stats.endpoints import LeagueGameLog
+import os
+import tempfile
+import time
+
+from player_features import PLAYER_LOG_DIR  # one CSV per season of player box scores (all teams)
+
+# List of seasons to fetch (adjust as needed)
+seasons = ['2021-22', '2022-23', '2023-24', '2024-25', '2025-26']
+
+
+def season_log_path(season):
+    return os.path.join(PLAYER_LOG_DIR, f"{season.replace('-', '_')}.csv")
+
+
+def fetch_season(season):
+    """Fetch one season of player game logs and atomically replace its CSV; returns the row count."""
+    os.makedirs(PLAYER_LOG_DIR, exist_ok=True)
+    logs = LeagueGameLog(
+        season=season,
+        player_or_team_abbreviation="P",
+        season_type_all_star="Regular Season"
+    ).get_data_frames()[0]
+    logs["SEASON"] = season
+
+    # The refresh worker re-fetches the current season; readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=PLAYER_LOG_DIR, prefix=".players-", suffix=".csv.partial")
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            logs.to_csv(f, index=False)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, season_log_path(season))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(logs)
+
+
+def main():
+    print("Fetching player game logs...")
+
+    for season in seasons:
+        print(f"Getting season {season}...")
+        rows = fetch_season(season)
+        print(f"Saved {rows} rows to {season_log_path(season)}")
+
+        # Avoid hitting API too fast
+        time.sleep(1)
+
+
+if __name__ == "__main__":
+    main()
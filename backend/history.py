@@ -0,0 +1,138 @@
+# backend/history.py
+"""
+Team history queries served straight from a TeamGameIndex.
+
+A query resolves to a contiguous row range of the index (two binary searches),
+and the JSON response is generated BATCH_ROWS rows at a time from numpy column
+slices, so long ranges never materialize a DataFrame or a full response body.
+
+Pagination is keyset-based: the cursor encodes the team and the date of the
+next row, so it stays valid when a refresh inserts new games.
+"""
+
+import base64
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MATCHUP_DATASET_PATH = os.path.join(BASE_DIR, "data", "lakers_matchup_dataset.csv")
+OOS_PREDICTIONS_PATH = os.path.join(BASE_DIR, "data", "lakers_oos_predictions.csv")
+MODEL_META_PATH = os.path.join(BASE_DIR, "data", "lakers_model_meta.json")
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+BATCH_ROWS = 256
+DEFAULT_COLUMNS = [
+    "GAME_ID", "GAME_DATE", "MATCHUP", "WL", "PTS", "REB", "AST", "STL", "BLK",
+    "PTS_ROLL5", "REB_ROLL5", "AST_ROLL5", "STL_ROLL5", "BLK_ROLL5", "DAYS_REST", "BACK_TO_BACK",
+]
+LAKERS_ABBR = "LAL"
+
+
+def encode_cursor(team_id: int, next_date) -> str:
+    raw = f"{int(team_id)}:{pd.Timestamp(next_date).strftime('%Y-%m-%d')}"
+    return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(team_id, date) from a cursor; raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        team_part, date_part = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii").split(":")
+        return int(team_part), pd.Timestamp(date_part)
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+class PastPredictions:
+    """
+    Out-of-sample win probabilities for past Lakers games, by date.
+
+    Games the model was trained on come from the probabilities train_model.py
+    recorded for them out of sample; games after the model's trained_through
+    date are scored with the current model. Fitted values are never served.
+    """
+
+    def __init__(self, dates: np.ndarray, probabilities: np.ndarray):
+        order = np.argsort(dates, kind="stable")
+        self._dates = dates[order]
+        self._probs = probabilities[order]
+
+    @classmethod
+    def from_dataset(cls, model, scaler, feature_columns, class_index, path: str = MATCHUP_DATASET_PATH,
+                     oos_path: str = OOS_PREDICTIONS_PATH, meta_path: str = MODEL_META_PATH):
+        """None if there are no recorded out-of-sample probabilities or the dataset cannot be scored."""
+        if model is None or not feature_columns or not os.path.exists(oos_path):
+            return None
+        oos = pd.read_csv(oos_path)
+        oos_dates = pd.to_datetime(oos["GAME_DATE"]).to_numpy(dtype="datetime64[ns]")
+        oos_probs = oos["win_probability"].to_numpy(dtype=float)
+
+        trained_through = pd.Timestamp(oos_dates.max()) if len(oos_dates) else None
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                trained_through = pd.Timestamp(json.load(f)["trained_through"])
+
+        dates, probs = [oos_dates], [oos_probs]
+        if os.path.exists(path):
+            df = pd.read_csv(path)
+            df["GAME_DATE"] = pd.to_datetime(df["GAME_DATE"])
+            unseen = df[df["GAME_DATE"] > trained_through] if trained_through is not None else df
+            if not unseen.empty and all(col in unseen.columns for col in feature_columns):
+                X = unseen[feature_columns].fillna(0)
+                X = scaler.transform(X) if scaler is not None else X.to_numpy(dtype=float)
+                probs.append(model.predict_proba(X)[:, class_index].astype(float))
+                dates.append(unseen["GAME_DATE"].to_numpy(dtype="datetime64[ns]"))
+        return cls(np.concatenate(dates), np.concatenate(probs))
+
+    def lookup(self, dates: np.ndarray) -> np.ndarray:
+        """Probability for each date (NaN where there was no Lakers game)."""
+        pos = np.searchsorted(self._dates, dates)
+        pos_clipped = np.minimum(pos, len(self._dates) - 1)
+        hit = (pos < len(self._dates)) & (self._dates[pos_clipped] == dates)
+        return np.where(hit, self._probs[pos_clipped], np.nan)
+
+
+def _json_values(values: np.ndarray) -> list:
+    if values.dtype.kind == "M":
+        return np.datetime_as_string(values, unit="D").tolist()
+    out = values.tolist()
+    if values.dtype.kind in "fO":
+        out = [None if isinstance(v, float) and v != v else v for v in out]
+    return out
+
+
+def iter_history_json(index, team_id: int, team_abbr: str, lo: int, hi: int, columns: list,
+                      next_cursor=None, predictions=None):
+    """Yield the response body for rows [lo, hi) of `index` as JSON text chunks."""
+    head = {"team": team_abbr, "team_id": int(team_id), "columns": columns,
+            "count": hi - lo, "next_cursor": next_cursor}
+    yield json.dumps(head)[:-1] + ', "games": ['
+
+    first = True
+    matchups = index.column("MATCHUP") if predictions is not None and "MATCHUP" in index.columns else None
+    for start in range(lo, hi, BATCH_ROWS):
+        stop = min(start + BATCH_ROWS, hi)
+        col_values = [_json_values(index.column(col)[start:stop]) for col in columns]
+        keys = list(columns)
+
+        if predictions is not None:
+            probs = predictions.lookup(index.column("GAME_DATE")[start:stop])
+            if team_abbr != LAKERS_ABBR and matchups is not None:
+                # Only the opponent's games against the Lakers share a prediction
+                vs_lakers = pd.Series(matchups[start:stop]).str.contains(LAKERS_ABBR, regex=False).to_numpy()
+                probs = np.where(vs_lakers, probs, np.nan)
+            col_values.append(_json_values(probs))
+            keys.append("lakers_win_probability")
+
+        rows = [json.dumps(dict(zip(keys, values))) for values in zip(*col_values)]
+        chunk = ",".join(rows)
+        if not first:
+            chunk = "," + chunk
+        first = False
+        yield chunk
+
+    yield "]}"
@@ -0,0 +1,142 @@
+# backend/http_cache.py
+"""
+HTTP caching helpers for the Flask API.
+
+- `conditional(...)` gives a GET endpoint a strong ETag derived from the
+  data/model versions (not from the response body), so an `If-None-Match`
+  hit is answered with 304 before the view runs. The last rendered body is
+  also kept, so unconditional repeat polls skip the computation too.
+- `compress_response` is an after_request hook that gzips larger bodies for
+  clients that accept it; streamed JSON is compressed chunk by chunk.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+import zlib
+from functools import wraps
+
+from flask import Response, make_response, request
+
+COMPRESS_MIN_BYTES = 1024     # smaller bodies are not worth the CPU
+COMPRESS_LEVEL = 5
+GZIP_ETAG_SUFFIX = "-gz"      # strong ETags must differ per content-encoding
+
+
+def file_version(*paths) -> str:
+    """Cheap version string for files on disk (path, size, mtime); missing files count too."""
+    parts = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append(f"{path}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{path}:missing")
+    return make_etag(*parts)
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def _not_modified(etag: str, cache_control: str):
+    """Return a 304 if the request's If-None-Match matches `etag` (plain or gzip variant)."""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return None
+    for candidate in (etag, etag + GZIP_ETAG_SUFFIX):
+        if if_none_match.contains(candidate):
+            response = Response(status=304)
+            response.set_etag(candidate)
+            response.headers["Cache-Control"] = cache_control
+            response.vary.add("Accept-Encoding")
+            return response
+    return None
+
+
+def conditional(etag_fn, cache_control="no-cache"):
+    """
+    Decorate a GET view with ETag / If-None-Match handling.
+
+    `etag_fn()` must be cheap and change whenever the response could change
+    (data version, model version, date, query string...). Only 200 responses
+    are tagged and remembered; errors always recompute.
+    """
+    def decorator(view):
+        last = {}
+        lock = threading.Lock()
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = make_etag(etag_fn(), request.full_path)
+
+            not_modified = _not_modified(etag, cache_control)
+            if not_modified is not None:
+                return not_modified
+
+            with lock:
+                cached = last.get(etag)
+            if cached is not None:
+                body, mimetype = cached
+                response = Response(body, status=200, mimetype=mimetype)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if not response.is_streamed:
+                    with lock:
+                        last.clear()
+                        last[etag] = (response.get_data(), response.mimetype)
+
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = cache_control
+            response.vary.add("Accept-Encoding")
+            return response
+
+        return wrapper
+    return decorator
+
+
+def _gzip_stream(chunks):
+    """Gzip an iterable of str/bytes chunks without buffering the whole body."""
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(response):
+    """after_request hook: gzip bodies over COMPRESS_MIN_BYTES and streamed JSON."""
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or "gzip" not in request.accept_encodings
+    ):
+        return response
+
+    if response.is_streamed:
+        # Size is unknown up front; only compress streams we produce ourselves (JSON)
+        if not response.is_json:
+            return response
+        response.response = _gzip_stream(response.response)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(gzip.compress(body, compresslevel=COMPRESS_LEVEL))
+
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag + GZIP_ETAG_SUFFIX)
+    return response
@@ -0,0 +1,423 @@
+# backend/live.py
+"""
+Live in-game win probabilities.
+
+A LiveTracker thread polls one event feed covering every game in progress,
+applies each new play-by-play action to that game's GameState in constant
+time, re-scores it, and hands the updates to subscribers (the SSE endpoints
+in app.py). Feeds:
+
+  ReplayFeed   JSON-lines file of recorded games and actions (tests, demos)
+  LiveApiFeed  nba_api live scoreboard + play-by-play, fetched concurrently;
+               can record what it sees into a replay file
+
+In-game model: the final home margin is treated as normal with mean
+    current margin + pregame spread * share of game left + possession value
+and standard deviation MARGIN_SD * sqrt(share of game left). It starts at
+the pre-game probability and converges to the scoreboard as time runs out.
+"""
+
+import json
+import math
+import queue
+import re
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from statistics import NormalDist
+
+from nba_api.live.nba.endpoints import PlayByPlay, ScoreBoard
+
+PERIOD_SECONDS = 12 * 60
+REGULATION_PERIODS = 4
+REGULATION_SECONDS = REGULATION_PERIODS * PERIOD_SECONDS
+OVERTIME_SECONDS = 5 * 60
+MARGIN_SD = 13.5               # points; spread of final margins around the pre-game line
+POSSESSION_POINTS = 1.0        # expected margin swing of holding the ball
+HOME_COURT_POINTS = 2.5        # used only when there is no model prediction for a game
+SUBSCRIBER_QUEUE_SIZE = 256    # updates buffered per client before the oldest are dropped
+FETCH_WORKERS = 8              # concurrent play-by-play requests per poll
+
+_NORMAL = NormalDist()
+_CLOCK_RE = re.compile(r"PT(?:(\d+)M)?(?:([\d.]+)S)?")
+
+
+def parse_clock(clock):
+    """Seconds left in the period from an ISO duration like 'PT11M58.00S' (None if absent)."""
+    if not clock:
+        return None
+    match = _CLOCK_RE.fullmatch(str(clock))
+    if match is None:
+        return None
+    return int(match.group(1) or 0) * 60 + float(match.group(2) or 0)
+
+
+def pregame_from_records(home_wins=0, home_losses=0, away_wins=0, away_losses=0) -> float:
+    """Home win probability from season records (log5 plus home court)."""
+    home_pct = (home_wins + 1) / (home_wins + home_losses + 2)
+    away_pct = (away_wins + 1) / (away_wins + away_losses + 2)
+    log5 = home_pct * (1 - away_pct) / (home_pct * (1 - away_pct) + away_pct * (1 - home_pct))
+    spread = MARGIN_SD * _NORMAL.inv_cdf(log5) + HOME_COURT_POINTS
+    return _NORMAL.cdf(spread / MARGIN_SD)
+
+
+def pregame_home_probability(info: dict, upcoming, lakers_team_id: int) -> float:
+    """
+    Pre-game home win probability for a game: the model's precomputed
+    prediction for Lakers games (Snapshot.upcoming), season records otherwise.
+    """
+    home_id, away_id = info["home_id"], info["away_id"]
+    if lakers_team_id in (home_id, away_id):
+        lakers_home = home_id == lakers_team_id
+        opponent_id = away_id if lakers_home else home_id
+        for game in upcoming:
+            if game["opponent_id"] != opponent_id or game["home"] != lakers_home:
+                continue
+            if info.get("game_date") and not game["game_date"].startswith(info["game_date"]):
+                continue
+            prob = float(game["win_probability"])
+            return prob if lakers_home else 1.0 - prob
+    return pregame_from_records(info.get("home_wins", 0), info.get("home_losses", 0),
+                                info.get("away_wins", 0), info.get("away_losses", 0))
+
+
+class GameState:
+    """Running state of one game; `apply` is O(1) per action."""
+
+    __slots__ = (
+        "game_id", "game_date", "home_id", "away_id", "home_abbr", "away_abbr",
+        "pregame_home_prob", "spread", "home_score", "away_score", "period", "clock_seconds",
+        "possession_team", "home_possessions", "away_possessions", "actions",
+        "last_action_number", "final", "home_win_prob", "updated_at",
+    )
+
+    def __init__(self, info: dict, pregame_home_prob: float):
+        self.game_id = info["game_id"]
+        self.game_date = info.get("game_date")
+        self.home_id = int(info["home_id"])
+        self.away_id = int(info["away_id"])
+        self.home_abbr = info.get("home_abbr")
+        self.away_abbr = info.get("away_abbr")
+        # Keep the line finite for near-certain pre-game probabilities
+        self.pregame_home_prob = min(max(float(pregame_home_prob), 1e-4), 1 - 1e-4)
+        self.spread = MARGIN_SD * _NORMAL.inv_cdf(self.pregame_home_prob)
+        self.home_score = int(info.get("home_score") or 0)
+        self.away_score = int(info.get("away_score") or 0)
+        self.period = int(info.get("period") or 1)
+        self.clock_seconds = float(PERIOD_SECONDS)
+        self.possession_team = None
+        self.home_possessions = 0
+        self.away_possessions = 0
+        self.actions = 0
+        self.last_action_number = -1
+        self.final = False
+        self.home_win_prob = self.win_probability()
+        self.updated_at = time.time()
+
+    def seconds_remaining(self) -> float:
+        if self.period <= REGULATION_PERIODS:
+            return (REGULATION_PERIODS - self.period) * PERIOD_SECONDS + self.clock_seconds
+        return self.clock_seconds
+
+    def win_probability(self) -> float:
+        margin = self.home_score - self.away_score
+        remaining = self.seconds_remaining()
+        if self.final or (remaining <= 0 and margin != 0):
+            return 1.0 if margin > 0 else 0.0 if margin < 0 else 0.5
+        if remaining <= 0:
+            remaining = OVERTIME_SECONDS  # tied at the buzzer: another overtime
+
+        share_left = remaining / REGULATION_SECONDS
+        mean = margin + self.spread * share_left
+        if self.possession_team == self.home_id:
+            mean += POSSESSION_POINTS
+        elif self.possession_team == self.away_id:
+            mean -= POSSESSION_POINTS
+        return _NORMAL.cdf(mean / (MARGIN_SD * math.sqrt(share_left)))
+
+    def apply(self, action: dict) -> bool:
+        """Fold one play-by-play action into the state; False if it was already seen."""
+        number = action.get("actionNumber")
+        if number is not None:
+            if number <= self.last_action_number:
+                return False
+            self.last_action_number = number
+
+        if action.get("period"):
+            self.period = int(action["period"])
+        clock = parse_clock(action.get("clock"))
+        if clock is not None:
+            self.clock_seconds = clock
+        if action.get("scoreHome") not in (None, ""):
+            self.home_score = int(action["scoreHome"])
+        if action.get("scoreAway") not in (None, ""):
+            self.away_score = int(action["scoreAway"])
+
+        possession = action.get("possession")
+        if possession and possession != self.possession_team:
+            self.possession_team = possession
+            if possession == self.home_id:
+                self.home_possessions += 1
+            elif possession == self.away_id:
+                self.away_possessions += 1
+
+        if action.get("actionType") == "game" and action.get("subType") == "end" \
+                and self.period >= REGULATION_PERIODS and self.home_score != self.away_score:
+            self.final = True
+
+        self.actions += 1
+        self.home_win_prob = self.win_probability()
+        self.updated_at = time.time()
+        return True
+
+    def finish(self):
+        self.final = True
+        self.home_win_prob = self.win_probability()
+        self.updated_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "game_id": self.game_id,
+            "game_date": self.game_date,
+            "home": {"team_id": self.home_id, "abbr": self.home_abbr, "score": self.home_score,
+                     "possessions": self.home_possessions},
+            "away": {"team_id": self.away_id, "abbr": self.away_abbr, "score": self.away_score,
+                     "possessions": self.away_possessions},
+            "period": self.period,
+            "seconds_remaining_in_period": round(self.clock_seconds, 1),
+            "possession": self.possession_team,
+            "home_win_probability": self.home_win_prob,
+            "away_win_probability": 1.0 - self.home_win_prob,
+            "pregame_home_win_probability": self.pregame_home_prob,
+            "final": self.final,
+            "actions": self.actions,
+            "updated_at": self.updated_at,
+        }
+
+
+# ---------- feeds ----------
+# poll() returns (games, actions): game-info dicts (game_id, home_id, away_id,
+# home_abbr, away_abbr, game_date, records, final) and (game_id, action) pairs.
+
+class ReplayFeed:
+    """
+    Replays a JSON-lines file, `batch_size` records per poll. Each line is
+    {"type": "game", <game-info>} or {"type": "action", "game_id": ..., "action": {...}}.
+    """
+
+    def __init__(self, path: str, batch_size: int = 100):
+        self.path = path
+        self.batch_size = batch_size
+        self._file = open(path)
+        self.exhausted = False
+
+    def poll(self):
+        games, actions = [], []
+        for _ in range(self.batch_size):
+            line = self._file.readline()
+            if not line:
+                self.exhausted = True
+                self._file.close()
+                break
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("type") == "game":
+                games.append({k: v for k, v in record.items() if k != "type"})
+            else:
+                actions.append((record["game_id"], record["action"]))
+        return games, actions
+
+
+def _game_info(game: dict, board_date=None) -> dict:
+    home, away = game["homeTeam"], game["awayTeam"]
+    return {
+        "game_id": game["gameId"],
+        "game_date": (game.get("gameEt") or board_date or "")[:10] or None,
+        "home_id": int(home["teamId"]), "home_abbr": home.get("teamTricode"),
+        "away_id": int(away["teamId"]), "away_abbr": away.get("teamTricode"),
+        "home_wins": home.get("wins", 0), "home_losses": home.get("losses", 0),
+        "away_wins": away.get("wins", 0), "away_losses": away.get("losses", 0),
+        "home_score": home.get("score", 0), "away_score": away.get("score", 0),
+        "period": game.get("period"),
+        "final": game.get("gameStatus") == 3,
+    }
+
+
+class LiveApiFeed:
+    """Today's games from the NBA live API; play-by-play for all live games is fetched in parallel."""
+
+    exhausted = False
+
+    def __init__(self, timeout: float = 10, max_workers: int = FETCH_WORKERS, record_path: str = None):
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="live-pbp")
+        self._last_action = {}      # game_id -> highest actionNumber already returned
+        self._done = set()          # final games whose last actions were fetched
+        self._record = open(record_path, "a") if record_path else None
+
+    def _fetch_actions(self, game_id: str):
+        actions = PlayByPlay(game_id, timeout=self.timeout).get_dict()["game"]["actions"]
+        last = self._last_action.get(game_id, -1)
+        return [a for a in actions if a.get("actionNumber", 0) > last]
+
+    def poll(self):
+        board = ScoreBoard(timeout=self.timeout).get_dict()["scoreboard"]
+        games = [_game_info(g, board.get("gameDate")) for g in board["games"] if g.get("gameStatus", 1) > 1]
+        to_fetch = [g["game_id"] for g in games if g["game_id"] not in self._done]
+
+        actions = []
+        futures = {game_id: self._pool.submit(self._fetch_actions, game_id) for game_id in to_fetch}
+        for game_id, future in futures.items():
+            try:
+                new_actions = future.result()
+            except Exception as exc:
+                print(f"Live: play-by-play for {game_id} failed ({exc}); retrying next poll")
+                continue
+            if new_actions:
+                self._last_action[game_id] = max(a.get("actionNumber", 0) for a in new_actions)
+            actions.extend((game_id, a) for a in new_actions)
+        self._done.update(g["game_id"] for g in games if g["final"] and g["game_id"] in futures)
+
+        if self._record is not None:
+            for info in games:
+                self._record.write(json.dumps({"type": "game", **info}) + "\n")
+            for game_id, action in actions:
+                self._record.write(json.dumps({"type": "action", "game_id": game_id, "action": action}) + "\n")
+            self._record.flush()
+        return games, actions
+
+
+def create_feed(spec: str):
+    """'api' (optionally 'api:<record path>') for the live API, anything else is a replay file path."""
+    if spec == "api" or spec.startswith("api:"):
+        return LiveApiFeed(record_path=spec[4:] or None)
+    return ReplayFeed(spec)
+
+
+# ---------- tracking and fan-out ----------
+
+class Subscription:
+    """Bounded per-client queue; a slow client loses its oldest updates, never blocks the tracker."""
+
+    def __init__(self, game_id=None, maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self.game_id = game_id
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def offer(self, update: dict):
+        while True:
+            try:
+                self.queue.put_nowait(update)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float):
+        """Next update; raises queue.Empty after `timeout` seconds."""
+        return self.queue.get(timeout=timeout)
+
+
+def sse_event(update: dict) -> str:
+    return f"event: update\nid: {update['game_id']}:{update['actions']}\ndata: {json.dumps(update)}\n\n"
+
+
+class LiveTracker(threading.Thread):
+    """
+    Daemon thread following every game in one feed. Each poll applies all new
+    actions, then publishes at most one update per changed game, so fan-out
+    cost depends on games and clients, not on how many events arrived.
+    """
+
+    def __init__(self, feed, interval: float, pregame_fn=None):
+        super().__init__(name="live-tracker", daemon=True)
+        self.feed = feed
+        self.interval = interval
+        self.pregame_fn = pregame_fn or (lambda info: pregame_from_records(
+            info.get("home_wins", 0), info.get("home_losses", 0),
+            info.get("away_wins", 0), info.get("away_losses", 0)))
+        self.games = {}        # game_id -> GameState, only touched by this thread
+        self._latest = {}      # game_id -> last published payload, read by request threads
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.last_error = None
+
+    def _state_for(self, info: dict) -> GameState:
+        state = self.games.get(info["game_id"])
+        if state is None:
+            try:
+                pregame = self.pregame_fn(info)
+            except Exception as exc:
+                print(f"Live: no pre-game probability for {info['game_id']} ({exc}); using records")
+                pregame = pregame_from_records()
+            state = GameState(info, pregame)
+            self.games[state.game_id] = state
+        return state
+
+    def step(self) -> int:
+        """Poll the feed once; returns how many games changed."""
+        games, actions = self.feed.poll()
+        changed = {}
+        for info in games:
+            state = self._state_for(info)
+            if state.game_id not in self._latest:
+                changed[state.game_id] = state
+            if info.get("final") and not state.final:
+                state.finish()
+                changed[state.game_id] = state
+        for game_id, action in actions:
+            state = self.games.get(game_id)
+            if state is not None and state.apply(action):
+                changed[game_id] = state
+
+        for game_id, state in changed.items():
+            self._publish(state.to_dict())
+        return len(changed)
+
+    def _publish(self, update: dict):
+        self._latest[update["game_id"]] = update
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            if sub.game_id is None or sub.game_id == update["game_id"]:
+                sub.offer(update)
+
+    def subscribe(self, game_id=None) -> Subscription:
+        sub = Subscription(game_id)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def current(self, game_id=None) -> list:
+        """Latest published payloads (all games, or just `game_id`)."""
+        if game_id is not None:
+            return [self._latest[game_id]] if game_id in self._latest else []
+        return [self._latest[key] for key in sorted(self._latest)]
+
+    def run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.step()
+                self.last_error = None
+            except Exception as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                print("Live: poll failed")
+                traceback.print_exc()
+            if getattr(self.feed, "exhausted", False):
+                break
+            elapsed = time.monotonic() - started
+            if elapsed > self.interval:
+                print(f"Live: poll took {elapsed:.1f}s, longer than the {self.interval:.1f}s interval")
+            self._stop_event.wait(max(0.0, self.interval - elapsed))
+
+    def stop(self):
+        self._stop_event.set()
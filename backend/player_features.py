@@ -0,0 +1,252 @@
+# backend/player_features.py
+"""
+Player-availability features at (team, date) granularity.
+
+Player game logs (one row per player per game, see get_player_data.py) are
+reduced to one row per team game describing who actually played:
+
+  AVAIL_SHARE    - sum of the expected minutes (trailing average over each
+                   player's previous PLAYER_WINDOW games) of the players who
+                   played, divided by the 240 team minutes in regulation.
+                   Drops when high-minute players sit out.
+  MIN_WEIGHTED_PM - minutes-weighted average of those players' trailing
+                   plus-minus, i.e. the strength of the lineup used.
+  ROTATION_SIZE  - number of players who logged at least ROTATION_MIN minutes.
+
+Everything is computed with grouped numpy/pandas operations (no per-row
+Python), so a daily refresh over millions of player rows stays cheap.
+
+AVAILABILITY_CSV is a derived cache: `load_index` (used by
+build_matchup_dataset.py) and the refresh worker rebuild it whenever a player
+log is newer than it. `python player_features.py` forces a rebuild.
+"""
+
+import glob
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from team_index import group_slices
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PLAYER_LOG_DIR = os.path.join(BASE_DIR, "data", "player_game_logs")
+AVAILABILITY_CSV = os.path.join(BASE_DIR, "data", "player_availability.csv")
+
+PLAYER_WINDOW = 10           # previous games used for a player's expected minutes / plus-minus
+ROTATION_MIN = 10.0          # minutes needed to count as a rotation player
+TEAM_MINUTES = 240.0         # 5 players x 48 regulation minutes
+
+AVAILABILITY_STATS = ["AVAIL_SHARE", "MIN_WEIGHTED_PM", "ROTATION_SIZE"]
+# Column order appended to the matchup dataset / feature vector
+PLAYER_FEATURE_COLUMNS = [f"L_{s}" for s in AVAILABILITY_STATS] + [f"O_{s}" for s in AVAILABILITY_STATS]
+
+_USECOLS = ["PLAYER_ID", "TEAM_ID", "GAME_ID", "GAME_DATE", "MIN", "PLUS_MINUS"]
+
+
+def _minutes_to_float(values: pd.Series) -> pd.Series:
+    """MIN comes as a number from LeagueGameLog but as 'MM:SS' from some endpoints."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float).fillna(0.0)
+    text = values.astype(str)
+    parts = text.str.split(":", n=1, expand=True)
+    minutes = pd.to_numeric(parts[0], errors="coerce").fillna(0.0)
+    if parts.shape[1] > 1:
+        minutes = minutes + pd.to_numeric(parts[1], errors="coerce").fillna(0.0) / 60.0
+    return minutes
+
+
+def load_player_logs(log_dir: str = PLAYER_LOG_DIR) -> pd.DataFrame:
+    """Load every player log CSV under `log_dir`, keeping only the columns we aggregate."""
+    paths = sorted(glob.glob(os.path.join(log_dir, "*.csv")))
+    if not paths:
+        return pd.DataFrame(columns=_USECOLS)
+
+    frames = [
+        pd.read_csv(p, usecols=_USECOLS, dtype={"PLAYER_ID": "int64", "TEAM_ID": "int64", "GAME_ID": str})
+        for p in paths
+    ]
+    df = pd.concat(frames, ignore_index=True)
+    df["GAME_DATE"] = pd.to_datetime(df["GAME_DATE"], format="%Y-%m-%d", errors="coerce")
+    df["MIN"] = _minutes_to_float(df["MIN"])
+    df["PLUS_MINUS"] = pd.to_numeric(df["PLUS_MINUS"], errors="coerce").fillna(0.0)
+    return df.dropna(subset=["GAME_DATE"]).drop_duplicates(["PLAYER_ID", "GAME_ID"])
+
+
+def _prior_window_mean(values: np.ndarray, group_start: np.ndarray, window: int) -> np.ndarray:
+    """
+    Mean of the previous `window` values within each group (current row excluded).
+
+    `values` must be sorted by group then date and `group_start` holds the
+    index of each row's first group row. Uses one cumulative sum instead of
+    a grouped rolling window.
+    """
+    csum = np.concatenate([[0.0], np.cumsum(values, dtype=float)])
+    idx = np.arange(len(values))
+    lo = np.maximum(idx - window, group_start)
+    count = idx - lo
+    total = csum[idx] - csum[lo]
+    out = np.zeros(len(values), dtype=float)
+    np.divide(total, count, out=out, where=count > 0)
+    return out
+
+
+def aggregate_team_availability(player_logs: pd.DataFrame) -> pd.DataFrame:
+    """Reduce player-game rows to one row per (TEAM_ID, GAME_DATE)."""
+    if player_logs.empty:
+        return pd.DataFrame(columns=["TEAM_ID", "GAME_DATE"] + AVAILABILITY_STATS)
+
+    df = player_logs.sort_values(["PLAYER_ID", "GAME_DATE"], kind="stable").reset_index(drop=True)
+
+    player_ids = df["PLAYER_ID"].to_numpy()
+    is_start = np.ones(len(df), dtype=bool)
+    is_start[1:] = player_ids[1:] != player_ids[:-1]
+    start_idx = np.flatnonzero(is_start)
+    group_start = np.repeat(start_idx, np.diff(np.append(start_idx, len(df))))
+
+    minutes = df["MIN"].to_numpy(dtype=float)
+    exp_min = _prior_window_mean(minutes, group_start, PLAYER_WINDOW)
+    exp_pm = _prior_window_mean(df["PLUS_MINUS"].to_numpy(dtype=float), group_start, PLAYER_WINDOW)
+
+    df["EXP_MIN"] = exp_min
+    df["PM_X_MIN"] = exp_pm * minutes
+    df["IN_ROTATION"] = (minutes >= ROTATION_MIN).astype(int)
+
+    team = df.groupby(["TEAM_ID", "GAME_DATE"], sort=True).agg(
+        EXP_MIN=("EXP_MIN", "sum"),
+        PM_X_MIN=("PM_X_MIN", "sum"),
+        MIN=("MIN", "sum"),
+        ROTATION_SIZE=("IN_ROTATION", "sum"),
+    ).reset_index()
+
+    team["AVAIL_SHARE"] = team["EXP_MIN"] / TEAM_MINUTES
+    team["MIN_WEIGHTED_PM"] = (team["PM_X_MIN"] / team["MIN"].where(team["MIN"] > 0)).fillna(0.0)
+    return team[["TEAM_ID", "GAME_DATE"] + AVAILABILITY_STATS]
+
+
+class PlayerAvailabilityIndex:
+    """
+    As-of lookup over per-(team, date) availability rows.
+
+    Rows are stored sorted by team then date with one contiguous slice per
+    team, so a lookup is a dict hit plus a binary search. A game on date D
+    sees the team's most recent row strictly before D (the lineup it last
+    used), which is what is known before tip-off.
+    """
+
+    def __init__(self, team_df: pd.DataFrame):
+        team_df = team_df.astype({"TEAM_ID": "int64", "GAME_DATE": "datetime64[ns]"})
+        team_df = team_df.sort_values(["TEAM_ID", "GAME_DATE"], kind="stable").reset_index(drop=True)
+        self.frame = team_df
+        self._dates = team_df["GAME_DATE"].to_numpy(dtype="datetime64[ns]")
+        self._values = team_df[AVAILABILITY_STATS].to_numpy(dtype=float)
+        self._slices = group_slices(team_df["TEAM_ID"].to_numpy())
+
+    @classmethod
+    def from_csv(cls, path: str = AVAILABILITY_CSV):
+        df = pd.read_csv(path)
+        df["GAME_DATE"] = pd.to_datetime(df["GAME_DATE"], format="%Y-%m-%d")
+        return cls(df)
+
+    @classmethod
+    def from_player_logs(cls, log_dir: str = PLAYER_LOG_DIR):
+        return cls(aggregate_team_availability(load_player_logs(log_dir)))
+
+    def lookup(self, team_id: int, game_date) -> dict:
+        """Availability stats for `team_id` as of just before `game_date` (zeros if unknown)."""
+        span = self._slices.get(int(team_id))
+        if span is not None:
+            start, stop = span
+            target = np.datetime64(pd.Timestamp(game_date), "ns")
+            i = start + int(np.searchsorted(self._dates[start:stop], target, side="left")) - 1
+            if i >= start:
+                return dict(zip(AVAILABILITY_STATS, self._values[i].tolist()))
+        return {stat: 0.0 for stat in AVAILABILITY_STATS}
+
+    def lookup_many(self, team_ids, game_dates) -> pd.DataFrame:
+        """Vectorized `lookup` for aligned sequences; result keeps the input order."""
+        query = pd.DataFrame({
+            "TEAM_ID": pd.to_numeric(pd.Series(team_ids), errors="coerce").to_numpy(),
+            "GAME_DATE": pd.to_datetime(pd.Series(game_dates)).to_numpy(dtype="datetime64[ns]"),
+        })
+        query["_ORDER"] = np.arange(len(query))
+        valid = query.dropna(subset=["TEAM_ID", "GAME_DATE"]).copy()
+        valid["TEAM_ID"] = valid["TEAM_ID"].astype("int64")
+
+        merged = pd.merge_asof(
+            valid.sort_values("GAME_DATE"),
+            self.frame.sort_values("GAME_DATE"),
+            on="GAME_DATE",
+            by="TEAM_ID",
+            direction="backward",
+            allow_exact_matches=False,
+        )
+        out = query[["_ORDER"]].merge(merged[["_ORDER"] + AVAILABILITY_STATS], on="_ORDER", how="left")
+        return out.sort_values("_ORDER")[AVAILABILITY_STATS].fillna(0.0).reset_index(drop=True)
+
+
+def matchup_player_features(index: PlayerAvailabilityIndex, team_ids, opp_ids, game_dates) -> pd.DataFrame:
+    """L_/O_ availability columns for a batch of games, in PLAYER_FEATURE_COLUMNS order."""
+    lakers = index.lookup_many(team_ids, game_dates).add_prefix("L_")
+    opp = index.lookup_many(opp_ids, game_dates).add_prefix("O_")
+    return pd.concat([lakers, opp], axis=1)[PLAYER_FEATURE_COLUMNS]
+
+
+def player_log_paths(log_dir: str = PLAYER_LOG_DIR) -> list:
+    return sorted(glob.glob(os.path.join(log_dir, "*.csv")))
+
+
+def availability_is_stale(log_dir: str = PLAYER_LOG_DIR, csv_path: str = AVAILABILITY_CSV) -> bool:
+    """True if there are player logs and the aggregate is missing or older than any of them."""
+    paths = player_log_paths(log_dir)
+    if not paths:
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    csv_mtime = os.stat(csv_path).st_mtime_ns
+    return any(os.stat(path).st_mtime_ns > csv_mtime for path in paths)
+
+
+def rebuild_availability(log_dir: str = PLAYER_LOG_DIR, csv_path: str = AVAILABILITY_CSV) -> pd.DataFrame:
+    """Aggregate the player logs and atomically rewrite `csv_path`; returns the team frame."""
+    team_df = aggregate_team_availability(load_player_logs(log_dir))
+    # Unique temp file: every gunicorn worker runs its own refresh thread
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(csv_path), prefix=".availability-", suffix=".csv.partial")
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            team_df.to_csv(f, index=False, date_format="%Y-%m-%d")
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, csv_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return team_df
+
+
+def refresh_availability() -> bool:
+    """Rebuild AVAILABILITY_CSV if any player log is newer; True if it was rebuilt."""
+    if not availability_is_stale():
+        return False
+    rebuild_availability()
+    return True
+
+
+def load_index():
+    """Index over the aggregated CSV, rebuilt first if the player logs changed (None without data)."""
+    if availability_is_stale():
+        return PlayerAvailabilityIndex(rebuild_availability())
+    if os.path.exists(AVAILABILITY_CSV):
+        return PlayerAvailabilityIndex.from_csv(AVAILABILITY_CSV)
+    return None
+
+
+def main():
+    print(f"Aggregating player logs from {PLAYER_LOG_DIR}...")
+    team_df = rebuild_availability(PLAYER_LOG_DIR, AVAILABILITY_CSV)
+    print(f"Saved {len(team_df)} team-game rows to {AVAILABILITY_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# backend/predictor.py
+"""Feature validation and model scoring shared by the API and the refresh worker."""
+
+import numpy as np
+import pandas as pd
+
+
+def _ordered_values(raw_features, feature_columns) -> list:
+    """One row of feature values in `feature_columns` order (dict or sequence input)."""
+    if feature_columns:
+        if isinstance(raw_features, dict):
+            missing = [col for col in feature_columns if col not in raw_features]
+            if missing:
+                raise ValueError(f"Missing feature values for: {missing}")
+            ordered_values = [raw_features[col] for col in feature_columns]
+        else:
+            ordered_values = list(raw_features)
+            if len(ordered_values) != len(feature_columns):
+                raise ValueError(
+                    f"Expected {len(feature_columns)} feature values but received {len(ordered_values)}"
+                )
+    else:
+        ordered_values = np.array(raw_features).reshape(-1).tolist()
+    return ordered_values
+
+
+def prepare_feature_array(raw_features, feature_columns, scaler) -> np.ndarray:
+    """Validate and order incoming features, returning the scaled array."""
+    return prepare_feature_matrix([raw_features], feature_columns, scaler)
+
+
+def prepare_feature_matrix(rows, feature_columns, scaler) -> np.ndarray:
+    """Validate and order a batch of feature rows, scaling them in one call."""
+    ordered = [_ordered_values(raw, feature_columns) for raw in rows]
+    if len({len(values) for values in ordered}) > 1:
+        raise ValueError("All rows must have the same number of feature values")
+    features = np.array(ordered, dtype=float).reshape(len(ordered), -1)
+
+    if scaler is not None and feature_columns:
+        features_df = pd.DataFrame(features, columns=feature_columns)
+        features = scaler.transform(features_df)
+
+    return features
+
+
+def positive_class_index(model) -> int:
+    """Column of predict_proba holding the win probability."""
+    model_classes = list(getattr(model, "classes_", []))
+    if not model_classes:
+        return -1
+    if 1 in model_classes:
+        target_class = 1
+    elif "W" in model_classes:
+        target_class = "W"
+    else:
+        target_class = model_classes[-1]
+    return model_classes.index(target_class)
+
+
+def predict_from_features(model, features: np.ndarray):
+    """Return (prediction_int, win_probability_float)."""
+    if model is None:
+        raise RuntimeError("Model not loaded")
+
+    prediction_raw = model.predict(features)[0]
+    class_probs = model.predict_proba(features)[0]
+    probability = float(class_probs[positive_class_index(model)])
+
+    prediction = 1 if prediction_raw in (1, "W", True) else 0
+    return prediction, probability
@@ -0,0 +1,278 @@
+# backend/profiling.py
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it carries `X-Profile: 1` together with a valid
+`X-Admin-Token`, or when it is picked by random sampling
+(LAKERS_PROFILE_SAMPLE_RATE, e.g. 0.01 for 1% of traffic). cProfile runs
+around the handler and the result is saved, with request metadata, in a
+bounded on-disk ring buffer (oldest profiles are deleted first).
+
+Admin endpoints (only registered when LAKERS_ADMIN_TOKEN is set):
+  GET /admin/profiles               list saved profiles, newest first
+  GET /admin/profiles/<id>          download the .prof file (pstats format)
+  GET /admin/profiles/<id>?format=text   top functions as plain text
+  GET /admin/profiles/<id>?format=json   metadata incl. a top-functions summary
+
+Only one request is profiled at a time (on Python 3.12+ cProfile refuses a
+second active profiler); an overlapping request runs unprofiled and, if it
+asked for a profile, gets `X-Profile-Skipped`. Streamed responses do their
+work after the handler returns, so their profile would be empty: only the
+metadata is saved, with `skipped` giving the reason.
+
+Since predictions are precomputed, most of the model work happens in the
+background refresh, not in requests. LAKERS_PROFILE_REFRESH=1 profiles every
+RefreshWorker.refresh_once into the same ring buffer (trigger "refresh").
+
+With neither a token nor a sample rate configured, `init_profiling` registers
+nothing, so requests pay no cost at all.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import abort, g, jsonify, request, send_file
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.environ.get("LAKERS_PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+MAX_PROFILES = int(os.environ.get("LAKERS_MAX_PROFILES", "50"))
+SAMPLE_RATE = float(os.environ.get("LAKERS_PROFILE_SAMPLE_RATE", "0"))
+ADMIN_TOKEN = os.environ.get("LAKERS_ADMIN_TOKEN", "")
+PROFILE_REFRESH = os.environ.get("LAKERS_PROFILE_REFRESH", "").lower() in ("1", "true", "yes")
+
+PROFILE_HEADER = "X-Profile"
+ADMIN_HEADER = "X-Admin-Token"
+SKIPPED_HEADER = "X-Profile-Skipped"
+TOP_FUNCTIONS = 15            # functions kept in each profile's metadata summary
+
+_save_lock = threading.Lock()
+_active_lock = threading.Lock()   # held while a request is being profiled
+
+
+def _is_admin() -> bool:
+    supplied = request.headers.get(ADMIN_HEADER, "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(supplied, ADMIN_TOKEN)
+
+
+def _trigger():
+    """Why this request should be profiled, or None."""
+    if request.path.startswith("/admin/profiles"):
+        return None
+    if request.headers.get(PROFILE_HEADER) == "1" and _is_admin():
+        return "header"
+    if SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE:
+        return "sample"
+    return None
+
+
+def _top_functions(stats: pstats.Stats, limit: int = TOP_FUNCTIONS):
+    rows = []
+    for (filename, line, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({func})",
+            "calls": ncalls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+        })
+    rows.sort(key=lambda r: r["cumtime_ms"], reverse=True)
+    return rows[:limit]
+
+
+def _profile_paths(profile_id: str):
+    return os.path.join(PROFILE_DIR, f"{profile_id}.prof"), os.path.join(PROFILE_DIR, f"{profile_id}.json")
+
+
+def _list_ids():
+    """Saved profile ids, oldest first (ids start with a millisecond timestamp)."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted(name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith(".json"))
+
+
+def save_profile(profiler, metadata: dict) -> str:
+    """
+    Write one profile + metadata and trim the ring buffer to MAX_PROFILES.
+    With `profiler=None` only the metadata is written (see `skipped`).
+    """
+    profile_id = f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+    prof_path, meta_path = _profile_paths(profile_id)
+
+    stats = pstats.Stats(profiler) if profiler is not None else None
+    metadata = dict(metadata, id=profile_id, top_functions=_top_functions(stats) if stats else [])
+
+    with _save_lock:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if stats is not None:
+            stats.dump_stats(prof_path)
+        with open(meta_path, "w") as f:
+            json.dump(metadata, f)
+
+        ids = _list_ids()
+        for old_id in ids[:max(0, len(ids) - MAX_PROFILES)]:
+            for path in _profile_paths(old_id):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    return profile_id
+
+
+def profile_call(fn, name: str, trigger: str = "refresh"):
+    """
+    Run `fn()` under cProfile and save the result like a request profile.
+    If another profile is active, `fn` just runs unprofiled.
+    """
+    if not _active_lock.acquire(blocking=False):
+        return fn()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        _active_lock.release()
+        return fn()
+
+    started, started_at = time.perf_counter(), datetime.now()
+    status = "error"
+    try:
+        result = fn()
+        status = "ok" if result is not False else "failed"
+        return result
+    finally:
+        profiler.disable()
+        _active_lock.release()
+        save_profile(profiler, {
+            "created_at": started_at.isoformat(timespec="milliseconds"),
+            "method": "TASK",
+            "path": name,
+            "query": "",
+            "status": status,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "trigger": trigger,
+        })
+
+
+def _start_profile():
+    trigger = _trigger()
+    if trigger is None:
+        return
+    if not _active_lock.acquire(blocking=False):
+        g._profile_skipped = "another request is being profiled"
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as exc:
+        # Another profiler (e.g. a debugger's) already owns the interpreter hooks
+        _active_lock.release()
+        g._profile_skipped = str(exc)
+        return
+    g._profile = (profiler, trigger, time.perf_counter(), datetime.now())
+
+
+def _stop_profile():
+    """Disable and return the active profile state for this request (None if there is none)."""
+    state = g.pop("_profile", None)
+    if state is not None:
+        state[0].disable()
+        _active_lock.release()
+    return state
+
+
+def _finish_profile(response):
+    state = _stop_profile()
+    if state is None:
+        skipped = g.pop("_profile_skipped", None)
+        if skipped and request.headers.get(PROFILE_HEADER) == "1":
+            response.headers[SKIPPED_HEADER] = skipped
+        return response
+    profiler, trigger, started, started_at = state
+
+    metadata = {
+        "created_at": started_at.isoformat(timespec="milliseconds"),
+        "method": request.method,
+        "path": request.path,
+        "query": request.query_string.decode("utf-8", "replace"),
+        "status": response.status_code,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        "trigger": trigger,
+        "remote_addr": request.remote_addr,
+        "user_agent": request.headers.get("User-Agent", ""),
+    }
+    if response.is_streamed:
+        # The body generator runs after this hook, so the profile holds none of the work
+        metadata["skipped"] = "streamed response; the body is generated after the handler returns"
+        profiler = None
+    profile_id = save_profile(profiler, metadata)
+    response.headers["X-Profile-Id"] = profile_id
+    if profiler is None:
+        response.headers[SKIPPED_HEADER] = metadata["skipped"]
+    return response
+
+
+def _discard_profile(exc=None):
+    # after_request is skipped when the handler raises; never leave a profiler running
+    _stop_profile()
+    g.pop("_profile_skipped", None)
+
+
+def _require_admin():
+    if not _is_admin():
+        abort(403)
+
+
+def list_profiles():
+    _require_admin()
+    profiles = []
+    for profile_id in reversed(_list_ids()):
+        _, meta_path = _profile_paths(profile_id)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta.pop("top_functions", None)
+        profiles.append(meta)
+    return jsonify({"profiles": profiles, "max_profiles": MAX_PROFILES}), 200
+
+
+def get_profile(profile_id: str):
+    _require_admin()
+    if profile_id not in _list_ids():
+        abort(404)
+    prof_path, meta_path = _profile_paths(profile_id)
+
+    if request.args.get("format") != "json" and not os.path.exists(prof_path):
+        return jsonify({"error": "No profile data was recorded for this request; see format=json"}), 404
+    if request.args.get("format") == "text":
+        out = io.StringIO()
+        pstats.Stats(prof_path, stream=out).sort_stats("cumulative").print_stats(40)
+        return out.getvalue(), 200, {"Content-Type": "text/plain; charset=utf-8"}
+    if request.args.get("format") == "json":
+        with open(meta_path) as f:
+            return jsonify(json.load(f)), 200
+    return send_file(prof_path, mimetype="application/octet-stream",
+                     as_attachment=True, download_name=f"{profile_id}.prof")
+
+
+def init_profiling(app):
+    """Register profiling hooks and admin routes only if profiling is configured."""
+    if not ADMIN_TOKEN and SAMPLE_RATE <= 0:
+        return False
+
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_discard_profile)
+
+    if ADMIN_TOKEN:
+        app.add_url_rule("/admin/profiles", "list_profiles", list_profiles, methods=["GET"])
+        app.add_url_rule("/admin/profiles/<profile_id>", "get_profile", get_profile, methods=["GET"])
+    return True
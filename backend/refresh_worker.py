@@ -0,0 +1,395 @@
+# backend/refresh_worker.py
+"""
+Background refresh of everything the API serves.
+
+A RefreshWorker thread periodically:
+  1. pulls the current season's game logs into the game store and, when the
+     store changed, rebuilds the all-teams frame (rolling columns) from it,
+  2. reloads the model artifacts if they changed on disk,
+  3. for models with player-availability features, re-fetches the current
+     season's player logs once a day and re-aggregates them when they changed,
+  4. rebuilds the per-team feature index,
+  5. finds the upcoming Lakers games and scores them,
+and then publishes the result as a new immutable Snapshot. Request handlers
+only read `store.current()`; a refresh that raises leaves the previous
+snapshot serving.
+"""
+
+import os
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+import joblib
+import pandas as pd
+
+from nba_api.stats.endpoints import LeagueGameLog, ScoreboardV2
+
+from feature_builder import BASE_FEATURE_COLUMNS, STATS, build_features_for_matchup
+from history import MATCHUP_DATASET_PATH, MODEL_META_PATH, OOS_PREDICTIONS_PATH, PastPredictions
+from explain import TreeExplainer
+from game_store import MANIFEST_PATH as GAME_STORE_MANIFEST_PATH, GameStore
+from http_cache import file_version, make_etag
+from get_player_data import fetch_season as fetch_player_season, season_log_path as player_season_log_path
+from player_features import (
+    AVAILABILITY_CSV, PLAYER_FEATURE_COLUMNS, load_index as load_player_index, player_log_paths, refresh_availability,
+)
+from profiling import PROFILE_REFRESH, profile_call
+from predictor import positive_class_index, predict_from_features, prepare_feature_array
+from team_index import TeamGameIndex
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+MODEL_PATH = os.path.join(DATA_DIR, "lakers_win_model.pkl")
+SCALER_PATH = os.path.join(DATA_DIR, "lakers_scaler.pkl")
+FEATURE_COLS_PATH = os.path.join(DATA_DIR, "lakers_feature_cols.pkl")
+
+LAKERS_TEAM_ID = 1610612747
+MAX_DAYS_AHEAD = 30           # how far ahead to look for the next Lakers game
+UPCOMING_GAMES = 3            # how many upcoming Lakers games to precompute
+ROLL_WINDOW = 5
+FIRST_GAME_DAYS_REST = 3      # DAYS_REST used for a team's first game in the dataset
+SLEEP_BETWEEN_API_CALLS = 0.6
+PLAYER_LOG_MAX_AGE = 24 * 3600  # seconds before the current season's player logs are re-fetched
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Everything a request handler needs, built once and never mutated."""
+    version: str
+    created_at: datetime
+    model_version: str
+    data_version: str
+    model: object = None
+    scaler: object = None
+    feature_columns: Optional[list] = None
+    all_games_df: Optional[pd.DataFrame] = None
+    team_index: Optional[TeamGameIndex] = None
+    player_index: object = None
+    explainer: Optional[TreeExplainer] = None
+    past_predictions: Optional[PastPredictions] = None    # for /history?include_predictions=1
+    upcoming: tuple = ()                      # precomputed prediction payloads, soonest first
+    next_game_error: Optional[str] = None     # why `upcoming` is empty, if it is
+
+    @property
+    def next_game(self):
+        return self.upcoming[0] if self.upcoming else None
+
+
+class SnapshotStore:
+    """Holds the current Snapshot; publishing is a single reference swap."""
+
+    def __init__(self, snapshot: Snapshot):
+        self._snapshot = snapshot
+        self._lock = threading.Lock()
+        self.last_refresh_error = None
+        self.last_refresh_at = None
+
+    def current(self) -> Snapshot:
+        return self._snapshot
+
+    def publish(self, snapshot: Snapshot):
+        with self._lock:
+            self._snapshot = snapshot
+            self.last_refresh_at = snapshot.created_at
+            self.last_refresh_error = None
+
+
+# ---------- loading ----------
+
+def _load_joblib(path: str):
+    if os.path.exists(path):
+        return joblib.load(path)
+    print(f"Warning: file not found at {path}")
+    return None
+
+
+def load_model_artifacts():
+    """(model, scaler, feature_columns, model_version)."""
+    version = file_version(MODEL_PATH, SCALER_PATH, FEATURE_COLS_PATH)
+    return _load_joblib(MODEL_PATH), _load_joblib(SCALER_PATH), _load_joblib(FEATURE_COLS_PATH), version
+
+
+_game_store = None
+
+
+def get_game_store() -> GameStore:
+    """Shared GameStore, opened on first use."""
+    global _game_store
+    if _game_store is None:
+        _game_store = GameStore()
+    return _game_store
+
+
+def load_all_games():
+    """All-teams game logs from the game store, with the rolling/rest columns added."""
+    store = get_game_store()
+    store.reload()  # other gunicorn workers append to the same store
+    df = store.read()
+    if df.empty:
+        print(f"Warning: game store is empty ({GAME_STORE_MANIFEST_PATH})")
+        return None
+    df["GAME_ID"] = pd.to_numeric(df["GAME_ID"])
+    return add_rolling_columns(df)
+
+
+def _uses_player_features(feature_columns) -> bool:
+    return bool(feature_columns) and any(col in feature_columns for col in PLAYER_FEATURE_COLUMNS)
+
+
+def _player_index_for(feature_columns):
+    # Only needed when the model was trained with player-availability columns
+    if _uses_player_features(feature_columns):
+        index = load_player_index()
+        if index is None:
+            print("Warning: model expects player-availability features but no player data was found")
+        return index
+    return None
+
+
+def _explainer_for(model):
+    if model is None:
+        return None
+    try:
+        return TreeExplainer(model)
+    except TypeError as exc:
+        print(f"Warning: explanations disabled ({exc})")
+        return None
+
+
+def _past_predictions_for(model, scaler, feature_columns):
+    try:
+        return PastPredictions.from_dataset(model, scaler, feature_columns, positive_class_index(model))
+    except Exception as exc:
+        print(f"Warning: could not score past games for /history ({exc})")
+        return None
+
+
+# ---------- new games ----------
+
+def current_season(today=None) -> str:
+    """NBA season string ('2025-26') containing `today`."""
+    today = today or datetime.today().date()
+    start = today.year if today.month >= 10 else today.year - 1
+    return f"{start}-{str(start + 1)[2:]}"
+
+
+def add_rolling_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """(Re)compute the rolling/rest columns of the all-teams dataset, per team."""
+    df = df.sort_values(["TEAM_ID", "GAME_DATE"], kind="stable").reset_index(drop=True)
+    grouped = df.groupby("TEAM_ID", sort=False)
+    for stat in STATS:
+        df[f"{stat}_ROLL{ROLL_WINDOW}"] = grouped[stat].transform(lambda s: s.rolling(ROLL_WINDOW).mean())
+    df["DAYS_REST"] = grouped["GAME_DATE"].diff().dt.days.fillna(FIRST_GAME_DAYS_REST)
+    df["BACK_TO_BACK"] = (df["DAYS_REST"] == 1).astype(int)
+    return df
+
+
+def pull_new_games() -> int:
+    """Fetch the current season from the API and append unseen games to the game store."""
+    season = current_season()
+    logs = LeagueGameLog(season=season, season_type_all_star="Regular Season").get_data_frames()[0]
+    if logs.empty:
+        return 0
+    logs["SEASON"] = season
+    return get_game_store().append(logs)
+
+
+def pull_player_logs() -> bool:
+    """Re-fetch the current season's player logs once they are PLAYER_LOG_MAX_AGE old; True if fetched."""
+    season = current_season()
+    path = player_season_log_path(season)
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < PLAYER_LOG_MAX_AGE:
+        return False
+    rows = fetch_player_season(season)
+    print(f"Refresh: fetched {rows} player rows for {season}")
+    return True
+
+
+# ---------- schedule & scoring ----------
+
+def find_upcoming_lakers_games(max_days_ahead: int = MAX_DAYS_AHEAD, limit: int = UPCOMING_GAMES):
+    """Use the nba_api scoreboard to list upcoming Lakers games as (date, home_flag, opponent_id)."""
+    today = datetime.today().date()
+    found = []
+
+    for i in range(max_days_ahead):
+        target_date = today + timedelta(days=i)
+        date_str = target_date.strftime("%m/%d/%Y")
+
+        try:
+            sb = ScoreboardV2(game_date=date_str)
+            games = sb.game_header.get_data_frame()
+        except Exception:
+            continue
+
+        mask = (games["HOME_TEAM_ID"] == LAKERS_TEAM_ID) | (games["VISITOR_TEAM_ID"] == LAKERS_TEAM_ID)
+        for _, game in games[mask].iterrows():
+            home_id = int(game["HOME_TEAM_ID"])
+            visitor_id = int(game["VISITOR_TEAM_ID"])
+            if home_id == LAKERS_TEAM_ID:
+                found.append((target_date, 1, visitor_id))
+            else:
+                found.append((target_date, 0, home_id))
+            if len(found) >= limit:
+                return found
+        time.sleep(SLEEP_BETWEEN_API_CALLS)
+
+    if not found:
+        raise RuntimeError(f"No upcoming Lakers game found in next {max_days_ahead} days.")
+    return found
+
+
+def score_matchup(snapshot_parts: dict, game_date, home_flag: int, opponent_id: int, team_abbr: dict) -> dict:
+    """Build features for one game and return the /next-game-prediction payload."""
+    player_index = snapshot_parts["player_index"]
+    feature_columns = snapshot_parts["feature_columns"]
+
+    features_vector = build_features_for_matchup(
+        all_games_df=snapshot_parts["all_games_df"],
+        game_date=game_date,
+        lakers_team_id=LAKERS_TEAM_ID,
+        opponent_team_id=opponent_id,
+        home_flag=home_flag,
+        player_index=player_index,
+        team_index=snapshot_parts["team_index"],
+    )
+
+    if feature_columns:
+        vector_columns = BASE_FEATURE_COLUMNS + (PLAYER_FEATURE_COLUMNS if player_index is not None else [])
+        raw_features = dict(zip(vector_columns, features_vector))
+    else:
+        raw_features = features_vector
+
+    features = prepare_feature_array(raw_features, feature_columns, snapshot_parts["scaler"])
+    prediction, probability = predict_from_features(snapshot_parts["model"], features)
+
+    return {
+        "opponent": team_abbr.get(opponent_id, "UNKNOWN"),
+        "opponent_id": opponent_id,
+        "game_date": game_date.isoformat(),
+        "home": bool(home_flag),
+        "prediction": prediction,
+        "win_probability": probability
+    }
+
+
+def build_snapshot(previous: Optional[Snapshot], team_abbr: dict, pull_games=True, score_games=True) -> Snapshot:
+    """
+    Build a fresh Snapshot. Reuses the previous snapshot's model/data when the
+    files have not changed. Raises on any failure other than "no game found".
+    """
+    if pull_games:
+        try:
+            added = pull_new_games()
+            if added:
+                print(f"Refresh: added {added} new team-game rows")
+        except Exception as exc:
+            # Stale-but-valid data is better than no refresh at all
+            print(f"Refresh: could not pull new games ({exc}); keeping current data")
+
+    model_version = file_version(MODEL_PATH, SCALER_PATH, FEATURE_COLS_PATH)
+    if previous is not None and previous.model_version == model_version:
+        model, scaler, feature_columns = previous.model, previous.scaler, previous.feature_columns
+        explainer = previous.explainer
+    else:
+        model, scaler, feature_columns, model_version = load_model_artifacts()
+        explainer = _explainer_for(model)
+
+    if _uses_player_features(feature_columns):
+        try:
+            if pull_games:
+                pull_player_logs()
+            if refresh_availability():
+                print("Refresh: re-aggregated player availability")
+        except Exception as exc:
+            print(f"Refresh: could not update player availability ({exc}); keeping current data")
+
+    # The game store manifest is replaced on every append, by this or another process
+    data_version = file_version(GAME_STORE_MANIFEST_PATH, AVAILABILITY_CSV, MATCHUP_DATASET_PATH,
+                                OOS_PREDICTIONS_PATH, MODEL_META_PATH, *player_log_paths())
+    if previous is not None and previous.data_version == data_version and previous.team_index is not None \
+            and previous.model_version == model_version:
+        all_games_df, team_index = previous.all_games_df, previous.team_index
+        player_index, past_predictions = previous.player_index, previous.past_predictions
+    else:
+        all_games_df = load_all_games()
+        team_index = TeamGameIndex(all_games_df) if all_games_df is not None else None
+        player_index = _player_index_for(feature_columns)
+        past_predictions = _past_predictions_for(model, scaler, feature_columns)
+
+    parts = {
+        "model": model,
+        "scaler": scaler,
+        "feature_columns": feature_columns,
+        "all_games_df": all_games_df,
+        "team_index": team_index,
+        "player_index": player_index,
+    }
+
+    upcoming, next_game_error = (), None
+    if score_games:
+        if model is None or all_games_df is None:
+            next_game_error = "Model not loaded" if model is None else "Game data not loaded"
+        else:
+            try:
+                games = find_upcoming_lakers_games()
+            except RuntimeError as exc:
+                next_game_error = str(exc)
+            else:
+                upcoming = tuple(score_matchup(parts, *game, team_abbr=team_abbr) for game in games)
+
+    created_at = datetime.now()
+    version = make_etag(model_version, data_version, created_at.date().isoformat(), upcoming, next_game_error)
+    return Snapshot(
+        version=version,
+        created_at=created_at,
+        model_version=model_version,
+        data_version=data_version,
+        upcoming=upcoming,
+        next_game_error=next_game_error,
+        explainer=explainer,
+        past_predictions=past_predictions,
+        **parts,
+    )
+
+
+class RefreshWorker(threading.Thread):
+    """Daemon thread that rebuilds and publishes snapshots every `interval` seconds."""
+
+    def __init__(self, store: SnapshotStore, team_abbr: dict, interval: float):
+        super().__init__(name="snapshot-refresh", daemon=True)
+        self.store = store
+        self.team_abbr = team_abbr
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def refresh_once(self) -> bool:
+        if PROFILE_REFRESH:
+            return profile_call(self._refresh, "RefreshWorker.refresh_once")
+        return self._refresh()
+
+    def _refresh(self) -> bool:
+        started = time.time()
+        try:
+            snapshot = build_snapshot(self.store.current(), self.team_abbr)
+        except Exception as exc:
+            self.store.last_refresh_error = f"{type(exc).__name__}: {exc}"
+            print("Refresh failed; previous snapshot keeps serving")
+            traceback.print_exc()
+            return False
+        self.store.publish(snapshot)
+        print(f"Refresh: published snapshot {snapshot.version[:8]} in {time.time() - started:.1f}s")
+        return True
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.refresh_once()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
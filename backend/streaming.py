@@ -0,0 +1,148 @@
+# backend/streaming.py
+"""
+Chunked (streaming) helpers shared by the cleaning and dataset-build scripts.
+
+Each script keeps its original in-memory path. Passing ``--chunk-size N``
+switches it to these helpers so peak memory is bounded by roughly N rows
+instead of the full history, while producing the same output file.
+"""
+
+import os
+
+import pandas as pd
+
+
+def iter_csv_chunks(path, chunk_size, date_col="GAME_DATE", **read_kwargs):
+    """Yield DataFrames of at most `chunk_size` rows with `date_col` parsed."""
+    for chunk in pd.read_csv(path, chunksize=chunk_size, **read_kwargs):
+        if date_col and date_col in chunk.columns:
+            chunk[date_col] = pd.to_datetime(chunk[date_col], errors="coerce")
+        yield chunk
+
+
+class DuplicateFilter:
+    """
+    Streaming equivalent of DataFrame.drop_duplicates() (keep='first').
+
+    Input must be ordered by `date_col` (see OrderGuard), so an exact
+    duplicate can only share a date with rows still to come. Only the 64-bit
+    hashes of rows on the most recent date are kept, which bounds memory by
+    the chunk size instead of the history size.
+    """
+
+    def __init__(self, date_col="GAME_DATE"):
+        self.date_col = date_col
+        self._seen = set()
+        self._last_date = None
+
+    def filter(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        hashes = pd.Series(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+        keep = ~hashes.duplicated() & ~hashes.isin(self._seen)
+
+        dates = chunk[self.date_col].reset_index(drop=True)
+        last = dates.iloc[-1]
+        on_last = (dates.isna() if pd.isna(last) else dates == last).to_numpy()
+        last_hashes = hashes[keep.to_numpy() & on_last].tolist()
+        same_date = pd.isna(last) if pd.isna(self._last_date) else last == self._last_date
+        if on_last.all() and self._last_date is not None and same_date:
+            self._seen.update(last_hashes)
+        else:
+            self._seen = set(last_hashes)
+        self._last_date = last
+
+        if keep.all():
+            return chunk
+        return chunk[keep.to_numpy()].copy()
+
+
+class OrderGuard:
+    """Raise if chunks are not sorted by `date_col` (NaT rows allowed only at the end)."""
+
+    def __init__(self, date_col="GAME_DATE"):
+        self.date_col = date_col
+        self._last = None
+        self._seen_nat = False
+
+    def check(self, chunk: pd.DataFrame):
+        dates = chunk[self.date_col]
+        valid = dates.dropna()
+        if self._seen_nat and not valid.empty:
+            raise ValueError("Streaming mode requires rows with a missing date to come last")
+        if not valid.is_monotonic_increasing or (
+            self._last is not None and not valid.empty and valid.iloc[0] < self._last
+        ):
+            raise ValueError(
+                f"Streaming mode requires input sorted by {self.date_col}; "
+                "sort the file or run without --chunk-size"
+            )
+        if not valid.empty:
+            self._last = valid.iloc[-1]
+        if dates.isna().any():
+            self._seen_nat = True
+
+
+class CarryOver:
+    """
+    Carry the last `lookback` rows of history across chunk boundaries.
+
+    `fn` is any frame -> frame transform whose value for a row depends only on
+    that row and at most `lookback` preceding rows (of the same `by` group, if
+    given), e.g. shift/diff/rolling. The carried rows are prepended to each
+    chunk before calling `fn` and stripped from the result, so every row sees
+    exactly the history it would have seen in a single in-memory pass.
+    """
+
+    def __init__(self, lookback: int, by=None):
+        self.lookback = lookback
+        self.by = by
+        self._tail = None
+
+    def apply(self, chunk: pd.DataFrame, fn) -> pd.DataFrame:
+        n_tail = 0 if self._tail is None else len(self._tail)
+        if n_tail:
+            frame = pd.concat([self._tail, chunk], ignore_index=True)
+        else:
+            frame = chunk.reset_index(drop=True)
+
+        if self.by is None:
+            self._tail = frame.tail(self.lookback)
+        else:
+            self._tail = frame.groupby(self.by, sort=False).tail(self.lookback)
+
+        result = fn(frame)
+        return result.iloc[n_tail:].reset_index(drop=True)
+
+
+class IncrementalCsvWriter:
+    """
+    Append DataFrames to a CSV one chunk at a time.
+
+    Output goes to a temporary file that replaces `path` only on a clean exit,
+    so an interrupted run never leaves a truncated dataset behind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.partial"
+        self.rows = 0
+        self.columns = None
+        self._header_written = False
+
+    def __enter__(self):
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        return self
+
+    def write(self, df: pd.DataFrame):
+        if not self._header_written:
+            self.columns = df.columns.tolist()
+        df.to_csv(self.tmp_path, mode="a", header=not self._header_written, index=False)
+        self._header_written = True
+        self.rows += len(df)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and self._header_written:
+            os.replace(self.tmp_path, self.path)
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        return False
@@ -0,0 +1,80 @@
+# backend/team_index.py
+"""Per-team, date-sorted index over the all-teams game DataFrame."""
+
+import numpy as np
+import pandas as pd
+
+
+def group_slices(ids: np.ndarray) -> dict:
+    """Map each id in a grouped (contiguous) array to its (start, stop) row range."""
+    slices = {}
+    if len(ids):
+        bounds = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+        starts = np.concatenate([[0], bounds])
+        stops = np.concatenate([bounds, [len(ids)]])
+        for start, stop in zip(starts, stops):
+            slices[int(ids[start])] = (int(start), int(stop))
+    return slices
+
+
+class TeamGameIndex:
+    """
+    all_games_df sorted by (TEAM_ID, GAME_DATE) with one contiguous row range
+    per team, so "games for team X before/between dates" is a dict lookup plus
+    a binary search instead of a boolean mask over every row.
+
+    The wrapped frame is shared, not copied per query; treat it as read-only.
+    """
+
+    def __init__(self, all_games_df: pd.DataFrame):
+        df = all_games_df.sort_values(["TEAM_ID", "GAME_DATE"], kind="stable").reset_index(drop=True)
+        self.frame = df
+        self._dates = df["GAME_DATE"].to_numpy(dtype="datetime64[ns]")
+        self._slices = group_slices(df["TEAM_ID"].to_numpy())
+        self._columns = {"GAME_DATE": self._dates}
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def team_ids(self):
+        return list(self._slices)
+
+    @property
+    def columns(self):
+        return self.frame.columns.tolist()
+
+    def column(self, name: str) -> np.ndarray:
+        """Whole-column numpy array, materialized once and then sliced per query."""
+        values = self._columns.get(name)
+        if values is None:
+            values = self.frame[name].to_numpy()
+            self._columns[name] = values
+        return values
+
+    def team_slice(self, team_id: int):
+        """(start, stop) rows for `team_id`; an empty range if the team is unknown."""
+        return self._slices.get(int(team_id), (0, 0))
+
+    def position(self, team_id: int, game_date, side: str = "left") -> int:
+        """Absolute row where `game_date` would be inserted within the team's range."""
+        start, stop = self.team_slice(team_id)
+        target = np.datetime64(pd.Timestamp(game_date), "ns")
+        return start + int(np.searchsorted(self._dates[start:stop], target, side=side))
+
+    def date_range(self, team_id: int, start=None, end=None):
+        """Absolute (lo, hi) rows of the team's games with start <= GAME_DATE <= end."""
+        lo, hi = self.team_slice(team_id)
+        if start is not None:
+            lo = self.position(team_id, start, side="left")
+        if end is not None:
+            hi = self.position(team_id, end, side="right")
+        return lo, max(lo, hi)
+
+    def prior_games(self, team_id: int, game_date, n: int = None) -> pd.DataFrame:
+        """The team's games strictly before `game_date` (only the last `n` if given)."""
+        start, _ = self.team_slice(team_id)
+        stop = self.position(team_id, game_date, side="left")
+        if n is not None:
+            start = max(start, stop - n)
+        return self.frame.iloc[start:stop]
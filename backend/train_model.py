@@ -1,68 +1,293 @@
+import argparse
+import copy
+import json
+from types import SimpleNamespace
+
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import StratifiedKFold, cross_val_predict, train_test_split
+from sklearn.pipeline import make_pipeline
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
+from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, log_loss
 import joblib
 import os
 
-# Load cleaned data
-print("Loading Lakers matchup data...")
-df = pd.read_csv("data/lakers_matchup_dataset.csv")
+from predictor import positive_class_index
 
-print(f"Dataset shape: {df.shape}")
-print(f"Columns: {df.columns.tolist()}")
+# ---------- CONFIG ----------
+DATASET_CSV = "data/lakers_matchup_dataset.csv"
+MODEL_PATH = "data/lakers_win_model.pkl"
+SCALER_PATH = "data/lakers_scaler.pkl"
+FEATURE_COLS_PATH = "data/lakers_feature_cols.pkl"
+META_PATH = "data/lakers_model_meta.json"      # what the current model was trained on
+OOS_PREDICTIONS_PATH = "data/lakers_oos_predictions.csv"   # out-of-sample win probabilities (/history)
+CV_FOLDS = 5                  # folds for the out-of-sample probabilities of a full train
 
-# Prepare features and target
-# Target: WL (1 = Win, 0 = Loss)
-# Features: All stats except GAME_DATE, SEASON, WL
+# --incremental
+TREES_PER_UPDATE = 10         # trees grown per incremental update
+MAX_TREES = 100               # oldest trees are dropped beyond this
+WINDOW_ROWS = 250             # most recent trained rows the new trees are fit on
+MIN_NEW_ROWS = 6              # new games the update must train on, on top of the holdout
+HOLDOUT_ROWS = 20             # newest games held back to validate the update (always this many)
+RANDOM_STATE = 42             # incremental update n seeds its new trees with RANDOM_STATE + n
+LOG_LOSS_TOLERANCE = 0.01     # candidate may be at most this much worse on the holdout
+# ----------------------------
 
 exclude_cols = ['GAME_DATE', 'SEASON', 'WL']
-feature_cols = [col for col in df.columns if col not in exclude_cols]
 
-X = df[feature_cols].fillna(0)
-y = df['WL'].fillna(0)
 
-print(f"\nFeatures ({len(feature_cols)}): {feature_cols}")
-print(f"Target distribution:\n{y.value_counts()}")
+def load_dataset():
+    # Load cleaned data
+    print("Loading Lakers matchup data...")
+    df = pd.read_csv(DATASET_CSV)
+    df['GAME_DATE'] = pd.to_datetime(df['GAME_DATE'])
+    df = df.sort_values('GAME_DATE', kind='stable').reset_index(drop=True)
+
+    print(f"Dataset shape: {df.shape}")
+    print(f"Columns: {df.columns.tolist()}")
+    return df
+
+
+def features_and_target(df, feature_cols):
+    X = df[feature_cols].fillna(0)
+    y = df['WL'].fillna(0)
+    return X, y
+
+
+def save_joblib_atomic(obj, path):
+    """Write next to `path` then rename, so the API never loads a half-written file."""
+    tmp_path = f"{path}.partial"
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_meta(meta):
+    tmp_path = f"{META_PATH}.partial"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, META_PATH)
+
+
+def load_meta():
+    if not os.path.exists(META_PATH):
+        return None
+    with open(META_PATH) as f:
+        return json.load(f)
+
+
+def save_oos_predictions(df, probabilities, append=False):
+    """
+    Record win probabilities for games the model producing them never trained
+    on; /history serves these instead of fitted values. With `append`, rows for
+    dates already recorded are kept as they were.
+    """
+    out = pd.DataFrame({
+        'GAME_DATE': df['GAME_DATE'].dt.strftime('%Y-%m-%d').to_numpy(),
+        'WL': df['WL'].to_numpy(),
+        'win_probability': np.asarray(probabilities, dtype=float),
+    })
+    if append and os.path.exists(OOS_PREDICTIONS_PATH):
+        out = pd.concat([pd.read_csv(OOS_PREDICTIONS_PATH), out], ignore_index=True)
+        out = out.drop_duplicates(subset='GAME_DATE', keep='first').sort_values('GAME_DATE', kind='stable')
+    tmp_path = f"{OOS_PREDICTIONS_PATH}.partial"
+    out.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, OOS_PREDICTIONS_PATH)
+
+
+def cross_validated_probabilities(df, feature_cols):
+    """Out-of-fold win probability for every row, from the same scaler + forest setup as train_full."""
+    X, y = features_and_target(df, feature_cols)
+    pipeline = make_pipeline(StandardScaler(),
+                             RandomForestClassifier(n_estimators=100, random_state=RANDOM_STATE, n_jobs=-1))
+    cv = StratifiedKFold(n_splits=CV_FOLDS, shuffle=True, random_state=RANDOM_STATE)
+    proba = cross_val_predict(pipeline, X, y, cv=cv, method='predict_proba')
+    # cross_val_predict orders the columns like np.unique(y), as classes_ would be
+    return proba[:, positive_class_index(SimpleNamespace(classes_=np.unique(y)))]
+
+
+def train_full(df):
+    # Prepare features and target
+    # Target: WL (1 = Win, 0 = Loss)
+    # Features: All stats except GAME_DATE, SEASON, WL
+    feature_cols = [col for col in df.columns if col not in exclude_cols]
+
+    X, y = features_and_target(df, feature_cols)
+
+    print(f"\nFeatures ({len(feature_cols)}): {feature_cols}")
+    print(f"Target distribution:\n{y.value_counts()}")
+
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Scale features
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    # Train Random Forest model
+    print("\nTraining Random Forest model...")
+    model = RandomForestClassifier(n_estimators=100, random_state=RANDOM_STATE, n_jobs=-1)
+    model.fit(X_train_scaled, y_train)
+
+    # Evaluate
+    y_pred = model.predict(X_test_scaled)
+    accuracy = accuracy_score(y_test, y_pred)
+
+    print(f"\nModel Accuracy: {accuracy:.4f}")
+    print(f"\nClassification Report:\n{classification_report(y_test, y_pred)}")
+    print(f"\nConfusion Matrix:\n{confusion_matrix(y_test, y_pred)}")
+
+    # Feature importance
+    feature_importance = pd.DataFrame({
+        'feature': feature_cols,
+        'importance': model.feature_importances_
+    }).sort_values('importance', ascending=False)
+
+    print(f"\nTop 10 Important Features:")
+    print(feature_importance.head(10))
+
+    # Save model and scaler
+    os.makedirs("data", exist_ok=True)
+    save_joblib_atomic(model, MODEL_PATH)
+    save_joblib_atomic(scaler, SCALER_PATH)
+    save_joblib_atomic(feature_cols, FEATURE_COLS_PATH)
+
+    trained_through = df['GAME_DATE'].max().strftime('%Y-%m-%d')
+    save_meta({
+        'mode': 'full',
+        'trained_through': trained_through,
+        'rows': int(len(df)),
+        'tree_added_through': [trained_through] * len(model.estimators_),
+        'updates': 0,
+        'holdout_accuracy': float(accuracy),
+    })
+
+    print(f"\nComputing {CV_FOLDS}-fold out-of-sample probabilities...")
+    save_oos_predictions(df, cross_validated_probabilities(df, feature_cols))
+
+    print(f"\nModel saved to {MODEL_PATH}")
+    print(f"Scaler saved to {SCALER_PATH}")
+    print(f"Feature columns saved to {FEATURE_COLS_PATH}")
+    print(f"Out-of-sample probabilities saved to {OOS_PREDICTIONS_PATH}")
+
+
+def _holdout_scores(model, X, y):
+    proba = model.predict_proba(X)
+    return accuracy_score(y, model.predict(X)), log_loss(y, proba, labels=model.classes_)
+
+
+def train_incremental(df):
+    """
+    Grow TREES_PER_UPDATE new trees (warm_start) on the most recent
+    WINDOW_ROWS games, drop the oldest trees beyond MAX_TREES, and publish
+    only if the result is not worse than the current model on the newest
+    HOLDOUT_ROWS games. The scaler and feature set stay fixed; a change in
+    either needs a full retrain.
+    """
+    meta = load_meta()
+    if meta is None or not os.path.exists(MODEL_PATH):
+        print("No model metadata found; running a full retrain instead.")
+        return train_full(df)
+
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    feature_cols = joblib.load(FEATURE_COLS_PATH)
+    missing = [col for col in feature_cols if col not in df.columns]
+    if missing or len(feature_cols) != len([c for c in df.columns if c not in exclude_cols]):
+        print("Feature columns changed since the last full train; run without --incremental.")
+        return
+
+    trained_through = pd.Timestamp(meta['trained_through'])
+    new_rows = df[df['GAME_DATE'] > trained_through]
+    print(f"\nNew games since {meta['trained_through']}: {len(new_rows)}")
+    if len(new_rows) < HOLDOUT_ROWS + MIN_NEW_ROWS:
+        print(f"Need {HOLDOUT_ROWS + MIN_NEW_ROWS} new games ({MIN_NEW_ROWS} to train on, "
+              f"{HOLDOUT_ROWS} to validate); waiting for more.")
+        return
+
+    # Newest games validate the update; they get trained on by the next one
+    holdout = new_rows.tail(HOLDOUT_ROWS)
+    trainable = df.loc[:holdout.index[0] - 1]
+    window = trainable.tail(WINDOW_ROWS)
+
+    X_window, y_window = features_and_target(window, feature_cols)
+    X_hold, y_hold = features_and_target(holdout, feature_cols)
+    if set(y_window.unique()) != set(model.classes_):
+        print("Recent window does not contain every class; skipping update.")
+        return
+    X_window_scaled = scaler.transform(X_window)
+    X_hold_scaled = scaler.transform(X_hold)
+
+    print(f"Growing {TREES_PER_UPDATE} trees on the last {len(window)} games "
+          f"(through {window['GAME_DATE'].max().date()}), validating on {len(holdout)}...")
+    # warm_start seeds new trees by skipping len(estimators_) draws from random_state;
+    # aging keeps that length fixed, so each update needs its own random_state
+    update = meta.get('updates', 0) + 1
+    candidate = copy.deepcopy(model)
+    candidate.set_params(warm_start=True, n_estimators=len(candidate.estimators_) + TREES_PER_UPDATE,
+                         random_state=RANDOM_STATE + update)
+    candidate.fit(X_window_scaled, y_window)
+
+    added_through = window['GAME_DATE'].max().strftime('%Y-%m-%d')
+    tree_ages = meta.get('tree_added_through') or [meta['trained_through']] * len(model.estimators_)
+    tree_ages = tree_ages + [added_through] * TREES_PER_UPDATE
+
+    # Age out the oldest trees (estimators_ keeps insertion order)
+    excess = len(candidate.estimators_) - MAX_TREES
+    if excess > 0:
+        candidate.estimators_ = candidate.estimators_[excess:]
+        tree_ages = tree_ages[excess:]
+    candidate.set_params(warm_start=False, n_estimators=len(candidate.estimators_))
 
-# Split data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    cur_acc, cur_loss = _holdout_scores(model, X_hold_scaled, y_hold)
+    new_acc, new_loss = _holdout_scores(candidate, X_hold_scaled, y_hold)
+    print(f"Holdout  current: accuracy {cur_acc:.4f}, log loss {cur_loss:.4f}")
+    print(f"Holdout candidate: accuracy {new_acc:.4f}, log loss {new_loss:.4f}")
 
-# Scale features
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
+    if new_loss > cur_loss + LOG_LOSS_TOLERANCE:
+        print("Candidate is worse on the holdout; keeping the current model.")
+        return
 
-# Train Random Forest model
-print("\nTraining Random Forest model...")
-model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
-model.fit(X_train_scaled, y_train)
+    # The current model never saw the games this update trains on: keep its
+    # probabilities for them before the new trees learn them
+    newly_trained = new_rows[new_rows['GAME_DATE'] <= window['GAME_DATE'].max()]
+    if not newly_trained.empty:
+        X_new, _ = features_and_target(newly_trained, feature_cols)
+        new_proba = model.predict_proba(scaler.transform(X_new))[:, positive_class_index(model)]
+        save_oos_predictions(newly_trained, new_proba, append=True)
 
-# Evaluate
-y_pred = model.predict(X_test_scaled)
-accuracy = accuracy_score(y_test, y_pred)
+    save_joblib_atomic(candidate, MODEL_PATH)
+    save_meta({
+        'mode': 'incremental',
+        'trained_through': added_through,
+        'rows': int(len(trainable)),
+        'tree_added_through': tree_ages,
+        'updates': update,
+        'holdout_accuracy': float(new_acc),
+        'holdout_log_loss': float(new_loss),
+    })
+    print(f"\nUpdated model saved to {MODEL_PATH} ({len(candidate.estimators_)} trees)")
 
-print(f"\nModel Accuracy: {accuracy:.4f}")
-print(f"\nClassification Report:\n{classification_report(y_test, y_pred)}")
-print(f"\nConfusion Matrix:\n{confusion_matrix(y_test, y_pred)}")
 
-# Feature importance
-feature_importance = pd.DataFrame({
-    'feature': feature_cols,
-    'importance': model.feature_importances_
-}).sort_values('importance', ascending=False)
+def main():
+    parser = argparse.ArgumentParser(description="Train the Lakers win model.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="update the current model with games added since it was trained")
+    parser.add_argument("--oos-only", action="store_true",
+                        help="only (re)write the out-of-sample probabilities, keeping the current model")
+    args = parser.parse_args()
 
-print(f"\nTop 10 Important Features:")
-print(feature_importance.head(10))
+    df = load_dataset()
+    if args.oos_only:
+        feature_cols = joblib.load(FEATURE_COLS_PATH)
+        save_oos_predictions(df, cross_validated_probabilities(df, feature_cols))
+        print(f"Out-of-sample probabilities saved to {OOS_PREDICTIONS_PATH}")
+    elif args.incremental:
+        train_incremental(df)
+    else:
+        train_full(df)
 
-# Save model and scaler
-os.makedirs("data", exist_ok=True)
-joblib.dump(model, "data/lakers_win_model.pkl")
-joblib.dump(scaler, "data/lakers_scaler.pkl")
-joblib.dump(feature_cols, "data/lakers_feature_cols.pkl")
 
-print("\nModel saved to data/lakers_win_model.pkl")
-print("Scaler saved to data/lakers_scaler.pkl")
-print("Feature columns saved to data/lakers_feature_cols.pkl")
+if __name__ == "__main__":
+    main()